@@ -5,6 +5,7 @@ Este script cria uma aplicação Streamlit para visualização dos dados de flux
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import datetime
@@ -13,28 +14,20 @@ import subprocess
 import sys
 import locale
 
-# Garantir que o diretório de trabalho é sempre o da pasta do app
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+from fluxo_estrangeiro.armazenamento import tabela_existe
+from fluxo_estrangeiro.intervalos import IndiceIntervalos
+from fluxo_estrangeiro.metadados import ler_metadados, versao_snapshot
+from fluxo_estrangeiro.snapshots import snapshot_atual, versao_publicada
+from fluxo_estrangeiro.cache_arrow import ler_processado
+from fluxo_estrangeiro.consulta_sql import executar_consulta, listar_tabelas, LIMITE_PADRAO
+from fluxo_estrangeiro.backtest import melhores_configuracoes, curvas_patrimonio
+from fluxo_estrangeiro.regimes import JANELA_REGIME, MIN_DURACAO
 
-# Configurar localização para português
-try:
-    locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
-except:
-    try:
-        locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil.1252')
-    except:
-        pass  # Se falhar, mantém o padrão
-
-# Configurações da página
-st.set_page_config(
-    page_title="Fluxo Estrangeiro B3",
-    page_icon="📈",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Aplicar tema dark
-st.markdown("""
+# Intervalo (s) entre verificações de novo snapshot nas sessões abertas; 0 desativa
+INTERVALO_VERIFICACAO = int(os.environ.get("FLUXO_VERIFICACAO_S", "60")) or None
+
+# Tema dark aplicado em configurar_pagina()
+ESTILO_CSS = """
 <style>
     /* Reset e configurações globais */
     html, body, [class*="css"] {
@@ -180,40 +173,173 @@ st.markdown("""
         background: #5a6072;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+def configurar_pagina():
+    """Aplica diretório de trabalho, localização, configuração da página e tema
+
+    Fica fora do nível do módulo para que importar este arquivo não tenha efeitos colaterais.
+    """
+    # Garantir que o diretório de trabalho é sempre o da pasta do app
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    
+    # Configurar localização para português
+    try:
+        locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
+    except:
+        try:
+            locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil.1252')
+        except:
+            pass  # Se falhar, mantém o padrão
+    
+    # Configurações da página (precisa ser o primeiro comando Streamlit da execução)
+    st.set_page_config(
+        page_title="Fluxo Estrangeiro B3",
+        page_icon="📈",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    # Aplicar tema dark
+    st.markdown(ESTILO_CSS, unsafe_allow_html=True)
 
 @st.cache_data(ttl=3600, show_spinner=False)
-def _ler_parquets(pasta):
-    """Lê os parquets do disco (com cache de 1h)"""
-    fluxo_completo  = pd.read_parquet(f"{pasta}/fluxo_completo.parquet").reset_index(drop=True)
-    fluxo_ano_atual = pd.read_parquet(f"{pasta}/fluxo_ano_atual.parquet").reset_index(drop=True)
-    fluxo_total     = pd.read_parquet(f"{pasta}/fluxo_total.parquet").reset_index(drop=True)
+def _ler_versao_snapshot(pasta_snapshot, publicada):
+    """Versão e metadados do snapshot, lidos do rodapé uma vez por snapshot publicado"""
+    caminho = f"{pasta_snapshot}/fluxo_completo.parquet"
+    return versao_snapshot(caminho), ler_metadados(caminho)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _ler_parquets(pasta, versao):
+    """Lê os parquets do disco (com cache de 1h por versão do snapshot)"""
+    # Cópia Arrow via memory-map quando disponível; Parquet como alternativa.
+    # As tabelas lidas ficam em cache_resource, sem serialização: todas as
+    # sessões usam os mesmos DataFrames somente leitura apoiados no mmap
+    fluxo_completo  = ler_processado("fluxo_completo", pasta, versao).reset_index(drop=True)
+    fluxo_ano_atual = ler_processado("fluxo_ano_atual", pasta, versao).reset_index(drop=True)
+    fluxo_total     = ler_processado("fluxo_total", pasta, versao).reset_index(drop=True)
     return fluxo_completo, fluxo_ano_atual, fluxo_total
 
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _ler_lead_lag(pasta, versao):
+    """Lê o perfil lead/lag pré-calculado no processamento (com cache de 1h)"""
+    caminho = f"{pasta}/lead_lag.parquet"
+    if not os.path.exists(caminho):
+        return pd.DataFrame()
+    return ler_processado("lead_lag", pasta, versao)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _ler_fluxo_anual(pasta, versao):
+    """Lê a matriz de fluxo acumulado por ano e pregão (com cache de 1h)"""
+    caminho = f"{pasta}/fluxo_anual.parquet"
+    if not os.path.exists(caminho):
+        return pd.DataFrame()
+    return ler_processado("fluxo_anual", pasta, versao)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _ler_anomalias(pasta, versao):
+    """Lê a tabela de eventos de fluxo extremo (com cache de 1h)"""
+    caminho = f"{pasta}/anomalias.parquet"
+    if not os.path.exists(caminho):
+        return pd.DataFrame()
+    return ler_processado("anomalias", pasta, versao)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _ler_backtest(pasta, versao):
+    """Lê os resultados do backtest da grade de parâmetros (com cache de 1h)"""
+    caminho = f"{pasta}/backtest.parquet"
+    if not os.path.exists(caminho):
+        return pd.DataFrame()
+    return ler_processado("backtest", pasta, versao)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _ler_regimes(pasta, versao):
+    """Lê drawdowns, períodos e resumo dos regimes de fluxo (com cache de 1h)"""
+    nomes = ["regimes_diario", "regimes_periodos", "regimes_resumo"]
+    if not all(os.path.exists(f"{pasta}/{nome}.parquet") for nome in nomes):
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    return tuple(ler_processado(nome, pasta, versao) for nome in nomes)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _carregar_indice_intervalos(pasta, versao):
+    """Monta o índice de datas com somas acumuladas (com cache de 1h)"""
+    return IndiceIntervalos(ler_processado("fluxo_prefixos", pasta, versao))
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=64)
+def _figura_em_cache(chave, _criar):
+    """Figura Plotly montada uma vez por chave (snapshot, versão e parâmetros)
+
+    O painel é redesenhado a cada verificação periódica; com as figuras em
+    cache, redesenhá-lo não reconstrói os gráficos. O Streamlit não altera a
+    figura recebida, então ela pode ser compartilhada entre sessões.
+    """
+    return _criar()
+
 def carregar_dados(pasta="Dados", atualizar=False):
-    """Carrega os dados processados ou executa a atualização se solicitado"""
+    """Carrega os dados processados ou executa a atualização se solicitado
+
+    Retorna também o diretório do snapshot lido e a sua versão publicada,
+    tirada da mesma leitura do ponteiro, para que o restante da execução leia
+    todas as tabelas do mesmo snapshot.
+    """
     arquivos_necessarios = [
         "fluxo_completo.parquet",
         "fluxo_ano_atual.parquet",
-        "fluxo_total.parquet"
+        "fluxo_total.parquet",
+        "fluxo_prefixos.parquet"
     ]
     
-    # Verificar se os arquivos existem
-    arquivos_ausentes = [f for f in arquivos_necessarios if not os.path.exists(f"{pasta}/{f}")]
+    # Verificar se os arquivos existem no snapshot publicado
+    pasta_snapshot = snapshot_atual(pasta)
+    arquivos_ausentes = [f for f in arquivos_necessarios if not os.path.exists(f"{pasta_snapshot}/{f}")]
+    
+    # Coletar apenas se solicitado ou se a base coletada não existir
+    coletar = atualizar or not all(
+        tabela_existe(t, pasta) for t in ["dados_da_bolsa", "dados_da_bolsa_final"]
+    )
     
     # Se arquivos estiverem ausentes ou se a atualização for solicitada, executar os scripts
-    if arquivos_ausentes or atualizar:
+    if arquivos_ausentes or coletar:
         with st.spinner("Atualizando dados do mercado..."):
-            st.info("Coletando dados da B3 e Yahoo Finance...")
-            subprocess.run([sys.executable, "1_coleta_dados.py"], check=True)
+            if coletar:
+                st.info("Coletando dados da B3 e Yahoo Finance...")
+                subprocess.run([sys.executable, "1_coleta_dados.py"], check=True)
             
             st.info("Processando dados coletados...")
             subprocess.run([sys.executable, "2_processa_dados.py"], check=True)
         
         # Limpar cache para forçar releitura após atualização
         _ler_parquets.clear()
+        _ler_lead_lag.clear()
+        _ler_fluxo_anual.clear()
+        _ler_anomalias.clear()
+        _ler_backtest.clear()
+        _ler_regimes.clear()
+        _carregar_indice_intervalos.clear()
+        pasta_snapshot = snapshot_atual(pasta)
+    
+    # O nome do snapshot é o conteúdo do ponteiro; no formato antigo não há ponteiro
+    if os.path.abspath(pasta_snapshot) != os.path.abspath(pasta):
+        publicada = os.path.basename(pasta_snapshot)
+    else:
+        publicada = versao_publicada(pasta)
     
-    return _ler_parquets(pasta)
+    # A versão vem do rodapé do parquet: uma nova versão invalida o cache sem ler os dados
+    versao, _ = _ler_versao_snapshot(pasta_snapshot, publicada)
+    return (*_ler_parquets(pasta_snapshot, versao), pasta_snapshot, publicada)
+
+def garantir_ano_corrente(fluxo_ano_atual, snapshot, indice):
+    """Garante que fluxo_ano_atual é do ano corrente (proteção contra parquet desatualizado)"""
+    ano_atual = datetime.datetime.now().year
+    if snapshot is not None:
+        ano_desatualizado = snapshot["ano_referencia"] != ano_atual
+    else:
+        ano_desatualizado = fluxo_ano_atual.empty or fluxo_ano_atual["Data"].dt.year.max() != ano_atual
+    if ano_desatualizado:
+        fluxo_ano_atual = indice.curva_acumulada(f"{ano_atual}-01-01", f"{ano_atual}-12-31")[
+            ["Data", "Ibovespa", "Estrangeiro", "Estrangeiro_em_dolar"]
+        ]
+    return fluxo_ano_atual
 
 def criar_grafico(dados, titulo):
     """Cria um gráfico interativo de barras e linhas para visualização dos dados de fluxo usando Plotly"""
@@ -300,8 +426,386 @@ def criar_grafico(dados, titulo):
     
     return fig
 
+def criar_grafico_diario(dados_diarios, anomalias):
+    """Cria o gráfico de fluxo estrangeiro diário com o Ibovespa e os dias de fluxo extremo"""
+    # Criando gráfico específico para dados diários
+    fig_diario = make_subplots(specs=[[{"secondary_y": True}]])
+    
+    # Adicionando dados do fluxo estrangeiro diário como barras
+    fig_diario.add_trace(
+        go.Bar(
+            x=dados_diarios['Data'],
+            y=dados_diarios['Estrangeiro'],
+            name="Estrangeiro",
+            marker_color='#58FFE9',
+            opacity=0.8,
+            hovertemplate='Data: %{x|%d/%m/%Y}<br>Valor: R$ %{y:.2f} milhões<extra></extra>'
+        ),
+        secondary_y=False,
+    )
+    
+    # Adicionando dados do Ibovespa como linha
+    fig_diario.add_trace(
+        go.Scatter(
+            x=dados_diarios['Data'],
+            y=dados_diarios['Ibovespa'],
+            name="Ibovespa",
+            line=dict(color='#FFD700', width=2),
+            hovertemplate='Data: %{x|%d/%m/%Y}<br>Ibovespa: %{y:.2f} pontos<extra></extra>'
+        ),
+        secondary_y=True,
+    )
+    
+    # Atualizando layout e eixos para dados diários
+    fig_diario.update_layout(
+        title="Fluxo Estrangeiro de Investimentos Diários na B3",
+        annotations=[dict(
+            x=0.5,
+            y=-0.15,
+            xref="paper",
+            yref="paper",
+            text="",
+            showarrow=False
+        )],
+        hovermode="x unified",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(color="#f0f2f6")
+        ),
+        height=600,
+        template="plotly_dark",
+        plot_bgcolor="#0e1117",
+        paper_bgcolor="#0e1117",
+        font=dict(color="#f0f2f6")
+    )
+    
+    fig_diario.update_xaxes(
+        title_text="Período",
+        tickangle=45,
+        rangeslider_visible=False,
+        tickformat="%d/%m/%Y",
+        hoverformat="%d/%m/%Y",
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    fig_diario.update_yaxes(
+        title_text="Estrangeiro Diário (Milhões R$)",
+        secondary_y=False,
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    fig_diario.update_yaxes(
+        title_text="Ibovespa (pontos)",
+        secondary_y=True,
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    # Destacar os dias de fluxo estrangeiro extremo a partir da tabela de eventos
+    if not anomalias.empty:
+        eventos_estrangeiro = anomalias[anomalias["Categoria"] == "Estrangeiro"]
+        for tipo, cor in [("Entrada extrema", "#00e676"), ("Saída extrema", "#ff5f71")]:
+            eventos_tipo = eventos_estrangeiro[eventos_estrangeiro["Tipo"] == tipo]
+            if eventos_tipo.empty:
+                continue
+            fig_diario.add_trace(
+                go.Scatter(
+                    x=eventos_tipo["Data"],
+                    y=eventos_tipo["Valor"],
+                    mode="markers",
+                    name=tipo,
+                    marker=dict(color=cor, size=10, symbol="diamond", line=dict(color="#f0f2f6", width=1)),
+                    hovertemplate=f'{tipo}<br>Data: %{{x|%d/%m/%Y}}<br>Valor: R$ %{{y:.2f}} milhões<extra></extra>'
+                ),
+                secondary_y=False,
+            )
+    
+    return fig_diario
+
+def criar_grafico_anos(matriz, ano_atual):
+    """Cria o gráfico de fluxo acumulado por ano, alinhado pelo número do pregão"""
+    valores = matriz.drop(columns="Primeiro_Pregao")
+    pregoes = valores.columns.astype(int)
+    
+    # Anos cuja base começa depois do início do ano não entram nas bandas
+    completos = matriz["Primeiro_Pregao"].dt.dayofyear <= 10
+    anteriores = valores[completos & (valores.index != ano_atual)].to_numpy(dtype=float)
+    
+    fig = go.Figure()
+    
+    if len(anteriores) >= 2:
+        p10, p50, p90 = np.nanpercentile(anteriores, [10, 50, 90], axis=0)
+        fig.add_trace(go.Scatter(x=pregoes, y=p90, line=dict(width=0), showlegend=False, hoverinfo="skip"))
+        fig.add_trace(
+            go.Scatter(
+                x=pregoes,
+                y=p10,
+                fill="tonexty",
+                fillcolor="rgba(163, 168, 184, 0.25)",
+                line=dict(width=0),
+                name="Percentis 10-90 (anos anteriores)",
+                hoverinfo="skip"
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=pregoes,
+                y=p50,
+                name="Mediana (anos anteriores)",
+                line=dict(color='#a3a8b8', width=1, dash="dash"),
+                hovertemplate='Pregão %{x}<br>Mediana: R$ %{y:.2f} milhões<extra></extra>'
+            )
+        )
+    
+    for ano, linha in valores.iterrows():
+        parcial = "" if completos[ano] else " (parcial)"
+        atual = ano == ano_atual
+        fig.add_trace(
+            go.Scatter(
+                x=pregoes,
+                y=linha.to_numpy(dtype=float),
+                name=f"{ano}{parcial}",
+                line=dict(color='#58FFE9' if atual else None, width=3 if atual else 1.5),
+                opacity=1 if atual else 0.6,
+                hovertemplate=f'{ano} - Pregão %{{x}}<br>Acumulado: R$ %{{y:.2f}} milhões<extra></extra>'
+            )
+        )
+    
+    fig.update_layout(
+        title="Fluxo Estrangeiro Acumulado por Ano",
+        hovermode="x unified",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(color="#f0f2f6")
+        ),
+        height=600,
+        template="plotly_dark",
+        plot_bgcolor="#0e1117",
+        paper_bgcolor="#0e1117",
+        font=dict(color="#f0f2f6")
+    )
+    
+    fig.update_xaxes(
+        title_text="Pregão do ano",
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    fig.update_yaxes(
+        title_text="Estrangeiro Acumulado (Milhões R$)",
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    return fig
+
+def criar_grafico_lead_lag(perfil, categoria, serie, max_lag=None):
+    """Cria o gráfico do perfil de correlação cruzada com as bandas de bootstrap"""
+    dados = perfil[(perfil["Categoria"] == categoria) & (perfil["Serie"] == serie)]
+    if max_lag is not None:
+        dados = dados[dados["Lag"].abs() <= max_lag]
+    
+    fig = go.Figure()
+    
+    # Banda de confiança sob a hipótese nula de ausência de relação
+    fig.add_trace(
+        go.Scatter(
+            x=dados["Lag"],
+            y=dados["Banda_Superior"],
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo="skip"
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=dados["Lag"],
+            y=dados["Banda_Inferior"],
+            fill="tonexty",
+            fillcolor="rgba(163, 168, 184, 0.25)",
+            line=dict(width=0),
+            name="Banda de confiança (bootstrap em blocos)",
+            hoverinfo="skip"
+        )
+    )
+    
+    # Correlação por lag
+    fig.add_trace(
+        go.Bar(
+            x=dados["Lag"],
+            y=dados["Correlacao"],
+            name="Correlação",
+            marker_color='#58FFE9',
+            opacity=0.8,
+            hovertemplate='Lag: %{x} pregões<br>Correlação: %{y:.3f}<extra></extra>'
+        )
+    )
+    
+    fig.update_layout(
+        title=f"Correlação cruzada: {categoria} x retorno do {serie}",
+        hovermode="x unified",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(color="#f0f2f6")
+        ),
+        height=500,
+        template="plotly_dark",
+        plot_bgcolor="#0e1117",
+        paper_bgcolor="#0e1117",
+        font=dict(color="#f0f2f6")
+    )
+    
+    fig.update_xaxes(
+        title_text="Lag (pregões) — positivo: fluxo antecede o mercado",
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    fig.update_yaxes(
+        title_text="Correlação",
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    return fig
+
+def criar_grafico_regimes(diario):
+    """Cria o gráfico de drawdowns em reais e em dólares sobre os regimes de fluxo"""
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.6, 0.4], vertical_spacing=0.06)
+    
+    # Drawdown do Ibovespa em reais e em dólares
+    for coluna, nome, cor in [("Drawdown_BRL", "Drawdown em reais", "#58FFE9"),
+                              ("Drawdown_USD", "Drawdown em dólares", "#FFB158")]:
+        fig.add_trace(
+            go.Scatter(
+                x=diario["Data"],
+                y=diario[coluna] * 100,
+                name=nome,
+                fill="tozeroy",
+                line=dict(color=cor, width=1.5),
+                opacity=0.7,
+                hovertemplate='%{x|%d/%m/%Y}<br>' + nome + ': %{y:.1f}%<extra></extra>'
+            ),
+            row=1, col=1
+        )
+    
+    # Fluxo estrangeiro na janela do regime, colorido pelo regime vigente
+    cores = {"Entrada": "#58FF8A", "Saída": "#FF5858", "Indefinido": "#a3a8b8"}
+    for regime, cor in cores.items():
+        dados = diario[diario["Regime"] == regime]
+        fig.add_trace(
+            go.Bar(
+                x=dados["Data"],
+                y=dados["Fluxo_Janela"],
+                name=f"Regime: {regime}",
+                marker_color=cor,
+                marker_line_width=0,
+                hovertemplate='%{x|%d/%m/%Y}<br>Fluxo na janela: R$ %{y:.2f} milhões<extra></extra>'
+            ),
+            row=2, col=1
+        )
+    
+    fig.update_layout(
+        title="Drawdown do Ibovespa e regimes de fluxo estrangeiro",
+        hovermode="x unified",
+        bargap=0,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(color="#f0f2f6")
+        ),
+        height=650,
+        template="plotly_dark",
+        plot_bgcolor="#0e1117",
+        paper_bgcolor="#0e1117",
+        font=dict(color="#f0f2f6")
+    )
+    
+    fig.update_xaxes(
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    fig.update_yaxes(title_text="Drawdown (%)", gridcolor="#2d3035", zerolinecolor="#4a4f60", row=1, col=1)
+    fig.update_yaxes(title_text="Fluxo na janela (R$ mi)", gridcolor="#2d3035", zerolinecolor="#4a4f60",
+                     row=2, col=1)
+    
+    return fig
+
+def criar_grafico_backtest(curvas):
+    """Cria o gráfico das curvas de patrimônio das melhores configurações"""
+    fig = go.Figure()
+    
+    cores = ['#58FFE9', '#FFB158', '#B158FF', '#58FF8A', '#FF5858']
+    for i, nome in enumerate(c for c in curvas.columns if c != "Data"):
+        referencia = nome.startswith("Ibovespa")
+        fig.add_trace(
+            go.Scatter(
+                x=curvas["Data"],
+                y=curvas[nome],
+                name=nome,
+                line=dict(
+                    color="#a3a8b8" if referencia else cores[i % len(cores)],
+                    width=2,
+                    dash="dot" if referencia else None
+                ),
+                hovertemplate='%{x|%d/%m/%Y}<br>Patrimônio: %{y:.2f}<extra></extra>'
+            )
+        )
+    
+    fig.update_layout(
+        title="Curvas de patrimônio (capital inicial = 1)",
+        hovermode="x unified",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="center",
+            x=0.5,
+            font=dict(color="#f0f2f6")
+        ),
+        height=550,
+        template="plotly_dark",
+        plot_bgcolor="#0e1117",
+        paper_bgcolor="#0e1117",
+        font=dict(color="#f0f2f6")
+    )
+    
+    fig.update_xaxes(
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    fig.update_yaxes(
+        title_text="Patrimônio",
+        type="log",
+        gridcolor="#2d3035",
+        zerolinecolor="#4a4f60"
+    )
+    
+    return fig
+
 def main():
     """Função principal da aplicação Streamlit"""
+    configurar_pagina()
+    
     # Cabeçalho com título e logo
     col1, col2 = st.columns([4, 1])
     with col1:
@@ -310,6 +814,17 @@ def main():
     with col2:
         st.image("amfl_selo_gradiente_sem_fundo.png", width=150)
     
+    exibir_painel()
+    exibir_analises()
+
+@st.fragment(run_every=INTERVALO_VERIFICACAO)
+def exibir_painel():
+    """Métricas e gráficos da aplicação
+
+    O painel é um fragmento: a cada INTERVALO_VERIFICACAO segundos ele relê o
+    ponteiro do snapshot publicado e, se a versão mudou, é redesenhado sozinho
+    com os dados novos, sem reexecutar o restante da página (Backtest e Dados).
+    """
     # Remover barra lateral de opções
     # st.sidebar.title("Opções")
     # atualizar_dados = st.sidebar.button("Atualizar Dados")
@@ -317,15 +832,28 @@ def main():
     # Carregar dados - sem botão de atualizar por enquanto
     atualizar_dados = False
     try:
-        fluxo_completo, fluxo_ano_atual, fluxo_total = carregar_dados(atualizar=atualizar_dados)
+        # O snapshot é fixado uma vez por execução: todas as leituras abaixo usam o mesmo
+        fluxo_completo, fluxo_ano_atual, fluxo_total, pasta_snapshot, publicada = carregar_dados(
+            atualizar=atualizar_dados
+        )
         
-        # Garantir que fluxo_ano_atual é do ano corrente (proteção contra parquet desatualizado)
-        ano_atual = datetime.datetime.now().year
-        if fluxo_ano_atual.empty or fluxo_ano_atual["Data"].dt.year.max() != ano_atual:
-            fluxo_ano_atual = fluxo_total[fluxo_total["Data"].dt.year == ano_atual].reset_index(drop=True)
+        # Avisar quando um snapshot novo foi publicado desde o último desenho do painel
+        anterior = st.session_state.get("versao_painel")
+        st.session_state["versao_painel"] = publicada
+        if anterior is not None and publicada != anterior:
+            st.toast("Novos dados publicados: painel atualizado.")
+        
+        # Metadados do snapshot lidos apenas do rodapé do parquet, uma vez por snapshot
+        versao, snapshot = _ler_versao_snapshot(pasta_snapshot, publicada)
+        
+        indice = _carregar_indice_intervalos(pasta_snapshot, versao)
+        fluxo_ano_atual = garantir_ano_corrente(fluxo_ano_atual, snapshot, indice)
 
         # Obter a data mais recente dos dados
-        data_max = fluxo_completo["Data"].max()
+        if snapshot is not None and snapshot["data_maxima"]:
+            data_max = pd.Timestamp(snapshot["data_maxima"])
+        else:
+            data_max = fluxo_completo["Data"].max()
         # Verificar se a data é NaT (Not a Time)
         if pd.notna(data_max):
             ultima_data = data_max.strftime("%d/%m/%Y")
@@ -364,7 +892,9 @@ def main():
             st.metric("Ibovespa Atual", "Dados não disponíveis")
     
     # Tabs para diferentes visualizações
-    tab1, tab2, tab3 = st.tabs(["Fluxo Acumulado", "Fluxo Diário", "Dados"])
+    tab1, tab2, tab_periodo, tab_regimes, tab_lead_lag = st.tabs(
+        ["Fluxo Acumulado", "Fluxo Diário", "Período", "Regimes", "Lead/Lag"]
+    )
     
     with tab1:
         ano_atual = datetime.datetime.now().year
@@ -378,20 +908,37 @@ def main():
             if atualizar_dados:
                 with st.spinner("Atualizando dados do mercado..."):
                     try:
-                        fluxo_completo, fluxo_ano_atual, fluxo_total = carregar_dados(atualizar=True)
-                        st.success("Dados atualizados com sucesso!")
+                        carregar_dados(atualizar=True)
+                        atualizado = True
                     except Exception as e:
+                        atualizado = False
                         st.error(f"Erro ao atualizar dados: {str(e)}")
+                # Fora do try: st.rerun interrompe a execução com uma exceção
+                if atualizado:
+                    # A página inteira é reexecutada para que Backtest e Dados usem o snapshot novo
+                    st.session_state["atualizacao_concluida"] = True
+                    st.rerun()
+            elif st.session_state.pop("atualizacao_concluida", False):
+                st.success("Dados atualizados com sucesso!")
         
         # Verificar se há dados para criar o gráfico
         if not fluxo_ano_atual.empty:
-            fig_ano_atual = criar_grafico(
-                fluxo_ano_atual, 
-                f"Fluxo Estrangeiro de Investimentos Acumulados na B3"
+            fig_ano_atual = _figura_em_cache(
+                ("ano_atual", pasta_snapshot, versao, ano_atual),
+                lambda: criar_grafico(fluxo_ano_atual, "Fluxo Estrangeiro de Investimentos Acumulados na B3")
             )
             st.plotly_chart(fig_ano_atual, use_container_width=True)
         else:
             st.warning("Não há dados disponíveis para exibir o gráfico de fluxo acumulado.")
+        
+        # Comparação com anos anteriores a partir da matriz pré-calculada
+        fluxo_anual = _ler_fluxo_anual(pasta_snapshot, versao)
+        if not fluxo_anual.empty:
+            st.subheader("Comparação com anos anteriores")
+            fig_anos = _figura_em_cache(
+                ("anos", pasta_snapshot, versao, ano_atual), lambda: criar_grafico_anos(fluxo_anual, ano_atual)
+            )
+            st.plotly_chart(fig_anos, use_container_width=True)
     
     with tab2:
         st.header("Fluxo Estrangeiro Diário")
@@ -402,90 +949,13 @@ def main():
             return
             
         # Configurando a visualização para dados diários (não acumulados)
-        dados_diarios = fluxo_completo.copy()
-        
-        # Criando gráfico específico para dados diários
-        fig_diario = make_subplots(specs=[[{"secondary_y": True}]])
-        
-        # Formatando as datas para português
-        dados_diarios['Data_Formatada'] = dados_diarios['Data'].dt.strftime('%d/%m/%Y')
+        dados_diarios = fluxo_completo
         
-        # Adicionando dados do fluxo estrangeiro diário como barras
-        fig_diario.add_trace(
-            go.Bar(
-                x=dados_diarios['Data'],
-                y=dados_diarios['Estrangeiro'],
-                name="Estrangeiro",
-                marker_color='#58FFE9',
-                opacity=0.8,
-                hovertemplate='Data: %{x|%d/%m/%Y}<br>Valor: R$ %{y:.2f} milhões<extra></extra>'
-            ),
-            secondary_y=False,
-        )
-        
-        # Adicionando dados do Ibovespa como linha
-        fig_diario.add_trace(
-            go.Scatter(
-                x=dados_diarios['Data'],
-                y=dados_diarios['Ibovespa'],
-                name="Ibovespa",
-                line=dict(color='#FFD700', width=2),
-                hovertemplate='Data: %{x|%d/%m/%Y}<br>Ibovespa: %{y:.2f} pontos<extra></extra>'
-            ),
-            secondary_y=True,
-        )
-        
-        # Atualizando layout e eixos para dados diários
-        fig_diario.update_layout(
-            title="Fluxo Estrangeiro de Investimentos Diários na B3",
-            annotations=[dict(
-                x=0.5,
-                y=-0.15,
-                xref="paper",
-                yref="paper",
-                text="",
-                showarrow=False
-            )],
-            hovermode="x unified",
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(color="#f0f2f6")
-            ),
-            height=600,
-            template="plotly_dark",
-            plot_bgcolor="#0e1117",
-            paper_bgcolor="#0e1117",
-            font=dict(color="#f0f2f6")
+        # Criando gráfico específico para dados diários, com os eventos de fluxo extremo
+        anomalias = _ler_anomalias(pasta_snapshot, versao)
+        fig_diario = _figura_em_cache(
+            ("diario", pasta_snapshot, versao), lambda: criar_grafico_diario(dados_diarios, anomalias)
         )
-        
-        fig_diario.update_xaxes(
-            title_text="Período",
-            tickangle=45,
-            rangeslider_visible=False,
-            tickformat="%d/%m/%Y",
-            hoverformat="%d/%m/%Y",
-            gridcolor="#2d3035",
-            zerolinecolor="#4a4f60"
-        )
-        
-        fig_diario.update_yaxes(
-            title_text="Estrangeiro Diário (Milhões R$)",
-            secondary_y=False,
-            gridcolor="#2d3035",
-            zerolinecolor="#4a4f60"
-        )
-        
-        fig_diario.update_yaxes(
-            title_text="Ibovespa (pontos)",
-            secondary_y=True,
-            gridcolor="#2d3035",
-            zerolinecolor="#4a4f60"
-        )
-        
         st.plotly_chart(fig_diario, use_container_width=True)
         
         # Adicionando métricas relevantes para os dados diários
@@ -500,7 +970,16 @@ def main():
                 st.metric("Último Valor Diário", "Dados não disponíveis")
         
         with col2:
-            if not dados_diarios.empty and len(dados_diarios["Estrangeiro"]) > 0:
+            recordes = pd.DataFrame()
+            if not anomalias.empty:
+                recordes = anomalias[(anomalias["Categoria"] == "Estrangeiro") &
+                                     (anomalias["Tipo"] == "Recorde de entrada")]
+            if not recordes.empty:
+                # O último recorde registrado é o maior fluxo diário, sem varrer o histórico
+                recorde = recordes.iloc[-1]
+                st.metric("Maior Fluxo Diário", f"R$ {recorde['Valor']:.2f} milhões",
+                          f"em {recorde['Data'].strftime('%d/%m/%Y')}")
+            elif not dados_diarios.empty and len(dados_diarios["Estrangeiro"]) > 0:
                 max_valor = dados_diarios["Estrangeiro"].max()
                 # Verificar se existem registros com o valor máximo
                 max_data_series = dados_diarios.loc[dados_diarios["Estrangeiro"] == max_valor, "Data"]
@@ -511,6 +990,221 @@ def main():
                     st.metric("Maior Fluxo Diário", f"R$ {max_valor:.2f} milhões")
             else:
                 st.metric("Maior Fluxo Diário", "Dados não disponíveis")
+        
+        # Tabela de eventos de fluxo extremo
+        if not anomalias.empty:
+            st.subheader("Eventos de Fluxo Extremo")
+            categoria_eventos = st.selectbox(
+                "Categoria de investidor:",
+                anomalias["Categoria"].unique(),
+                key="categoria_eventos"
+            )
+            eventos = anomalias[anomalias["Categoria"] == categoria_eventos]
+            st.dataframe(
+                eventos.drop(columns="Categoria").iloc[::-1].reset_index(drop=True),
+                column_config={
+                    "Data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+                    "Inicio": st.column_config.DateColumn("Início", format="DD/MM/YYYY"),
+                    "Em_Andamento": st.column_config.CheckboxColumn("Em andamento"),
+                }
+            )
+    
+    with tab_periodo:
+        st.header("Fluxo em um Período")
+        
+        if len(indice) == 0:
+            st.warning("Não há dados disponíveis para consultar períodos.")
+        else:
+            data_min = indice.data_minima.date()
+            data_max = indice.data_maxima.date()
+            inicio_padrao = max(data_min, datetime.date(data_max.year, 1, 1))
+            periodo = st.date_input(
+                "Período:",
+                value=(inicio_padrao, data_max),
+                min_value=data_min,
+                max_value=data_max,
+                format="DD/MM/YYYY"
+            )
+            
+            if isinstance(periodo, (tuple, list)) and len(periodo) == 2:
+                inicio, fim = periodo
+                metricas = indice.metricas(inicio, fim)
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Fluxo Estrangeiro no Período", f"R$ {metricas['Estrangeiro']:.2f} milhões")
+                with col2:
+                    if "Estrangeiro_em_dolar" in metricas:
+                        st.metric("Fluxo Estrangeiro em Dólar", f"US$ {metricas['Estrangeiro_em_dolar']:.2f} milhões")
+                with col3:
+                    if pd.notna(metricas.get("Ibovespa_variacao")):
+                        st.metric("Variação do Ibovespa", f"{metricas['Ibovespa_variacao'] * 100:.2f}%",
+                                  f"{metricas['Pregoes']} pregões")
+                
+                curva = indice.curva_acumulada(inicio, fim)
+                if not curva.empty:
+                    fig_periodo = _figura_em_cache(
+                        ("periodo", pasta_snapshot, versao, inicio, fim),
+                        lambda: criar_grafico(curva, f"Fluxo Estrangeiro Acumulado de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}")
+                    )
+                    st.plotly_chart(fig_periodo, use_container_width=True)
+                else:
+                    st.warning("Não há pregões no período selecionado.")
+            else:
+                st.info("Selecione as datas de início e fim do período.")
+    
+    with tab_regimes:
+        st.header("Drawdowns e Regimes de Fluxo")
+        
+        regimes_diario, regimes_periodos, regimes_resumo = _ler_regimes(pasta_snapshot, versao)
+        if regimes_diario.empty:
+            st.warning("Análise de regimes não disponível. Atualize os dados para calculá-la.")
+        else:
+            ultimo = regimes_diario.iloc[-1]
+            periodo_atual = regimes_periodos.iloc[-1]
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Drawdown em Reais", f"{ultimo['Drawdown_BRL'] * 100:.1f}%",
+                          f"pico de {ultimo['Pico_BRL']:.0f} pontos", delta_color="off")
+            with col2:
+                st.metric("Drawdown em Dólares", f"{ultimo['Drawdown_USD'] * 100:.1f}%",
+                          f"pico de {ultimo['Pico_USD']:.0f} pontos em US$", delta_color="off")
+            with col3:
+                st.metric("Regime Atual", periodo_atual["Regime"],
+                          f"{periodo_atual['Pregoes']} pregões desde {periodo_atual['Inicio']:%d/%m/%Y}",
+                          delta_color="off")
+            
+            fig_regimes = _figura_em_cache(
+                ("regimes", pasta_snapshot, versao), lambda: criar_grafico_regimes(regimes_diario)
+            )
+            st.plotly_chart(fig_regimes, use_container_width=True)
+            
+            st.subheader("Retornos do Ibovespa por regime")
+            st.dataframe(
+                regimes_resumo[[
+                    "Regime", "Periodos", "Duracao_Media", "Pregoes", "Retorno_Anual_BRL", "Retorno_Anual_USD",
+                    "Retorno_Seguinte_BRL", "Dias_de_Alta", "Volatilidade_BRL", "Drawdown_Medio_BRL"
+                ]].style.format({
+                    "Duracao_Media": "{:.1f}",
+                    "Retorno_Anual_BRL": "{:.1%}",
+                    "Retorno_Anual_USD": "{:.1%}",
+                    "Retorno_Seguinte_BRL": "{:.3%}",
+                    "Dias_de_Alta": "{:.0%}",
+                    "Volatilidade_BRL": "{:.1%}",
+                    "Drawdown_Medio_BRL": "{:.1%}"
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+            
+            st.subheader("Períodos sustentados mais recentes")
+            sustentados = regimes_periodos[regimes_periodos["Regime"] != "Indefinido"]
+            st.dataframe(
+                sustentados.iloc[::-1].head(15).style.format({
+                    "Inicio": "{:%d/%m/%Y}",
+                    "Fim": "{:%d/%m/%Y}",
+                    "Fluxo": "R$ {:.0f} mi",
+                    "Retorno_BRL": "{:.1%}",
+                    "Retorno_USD": "{:.1%}",
+                    "Drawdown_Max_BRL": "{:.1%}",
+                    "Drawdown_Max_USD": "{:.1%}"
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+            st.caption(
+                f"Regime de entrada ou saída: soma do fluxo estrangeiro dos últimos {JANELA_REGIME} pregões com o "
+                f"mesmo sinal há pelo menos {MIN_DURACAO} pregões seguidos naquela data. O rótulo usa apenas dados até o "
+                "pregão, e o retorno seguinte é o do pregão posterior ao regime observado."
+            )
+    
+    with tab_lead_lag:
+        st.header("Fluxo x Mercado: quem lidera?")
+        
+        perfil_lead_lag = _ler_lead_lag(pasta_snapshot, versao)
+        if perfil_lead_lag.empty:
+            st.warning("Perfil lead/lag não disponível. Atualize os dados para calculá-lo.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                categoria = st.selectbox("Categoria de investidor:", perfil_lead_lag["Categoria"].unique())
+            with col2:
+                serie = st.selectbox("Cotação:", perfil_lead_lag["Serie"].unique())
+            with col3:
+                lag_calculado = int(perfil_lead_lag["Lag"].max())
+                max_lag = st.slider("Defasagem máxima (pregões):", 1, lag_calculado,
+                                    lag_calculado) if lag_calculado > 1 else lag_calculado
+            
+            fig_lead_lag = _figura_em_cache(
+                ("lead_lag", pasta_snapshot, versao, categoria, serie, max_lag),
+                lambda: criar_grafico_lead_lag(perfil_lead_lag, categoria, serie, max_lag)
+            )
+            st.plotly_chart(fig_lead_lag, use_container_width=True)
+    
+def exibir_analises():
+    """Backtest, dados brutos e console SQL
+
+    Ficam fora do painel: só são reexecutados com a página inteira (interação
+    do usuário ou "Atualizar Dados"), nunca pela verificação periódica.
+    """
+    try:
+        fluxo_completo, fluxo_ano_atual, fluxo_total, pasta_snapshot, publicada = carregar_dados()
+        versao, snapshot = _ler_versao_snapshot(pasta_snapshot, publicada)
+        indice = _carregar_indice_intervalos(pasta_snapshot, versao)
+        fluxo_ano_atual = garantir_ano_corrente(fluxo_ano_atual, snapshot, indice)
+    except Exception as e:
+        st.error(f"Erro ao carregar dados: {str(e)}")
+        return
+    
+    tab_backtest, tab3 = st.tabs(["Backtest", "Dados"])
+    
+    with tab_backtest:
+        st.header("O fluxo antecipa o Ibovespa?")
+        
+        resultados_backtest = _ler_backtest(pasta_snapshot, versao)
+        if resultados_backtest.empty:
+            st.warning("Backtest não disponível. Atualize os dados para calculá-lo.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                categoria = st.selectbox("Categoria de investidor:", resultados_backtest["Categoria"].unique(),
+                                         key="categoria_backtest")
+            with col2:
+                regras = st.multiselect("Regras:", ["Momentum", "Reversão"], default=["Momentum", "Reversão"])
+            with col3:
+                criterio = st.selectbox("Ordenar por:", ["Sharpe", "Retorno_Anual", "Max_Drawdown", "Acerto"])
+            
+            filtrados = resultados_backtest[
+                (resultados_backtest["Categoria"] == categoria) & resultados_backtest["Regra"].isin(regras)
+            ]
+            melhores = melhores_configuracoes(filtrados, n=10, criterio=criterio)
+            if melhores.empty:
+                st.info("Nenhuma configuração com operações suficientes para os filtros escolhidos.")
+            else:
+                st.dataframe(
+                    melhores.drop(columns="Categoria").style.format({
+                        "Limiar": "{:.1f}σ",
+                        "Retorno_Total": "{:.1%}",
+                        "Retorno_Anual": "{:.1%}",
+                        "Volatilidade": "{:.1%}",
+                        "Sharpe": "{:.2f}",
+                        "Max_Drawdown": "{:.1%}",
+                        "Exposicao": "{:.0%}",
+                        "Acerto": "{:.0%}"
+                    }),
+                    hide_index=True,
+                    use_container_width=True
+                )
+                
+                curvas = curvas_patrimonio(fluxo_completo, melhores.head(5))
+                st.plotly_chart(criar_grafico_backtest(curvas), use_container_width=True)
+            
+            st.caption(
+                f"{len(resultados_backtest[resultados_backtest['Categoria'] == categoria])} combinações de regra, "
+                "janela (pregões) e limiar (desvios padrão do fluxo) avaliadas. A posição definida no fechamento "
+                "vale para o pregão seguinte, com custo por troca de posição. Os melhores resultados de uma grade "
+                "tendem a superestimar o desempenho fora da amostra."
+            )
     
     with tab3:
         st.header("Dados Brutos")
@@ -535,6 +1229,29 @@ def main():
             file_name="fluxo_estrangeiro_b3.csv",
             mime="text/csv",
         )
+        
+        # Console SQL sobre os arquivos Parquet
+        st.subheader("Consulta SQL")
+        st.caption("Tabelas disponíveis: " + ", ".join(f"`{t}`" for t in listar_tabelas("Dados", pasta_snapshot)))
+        sql = st.text_area(
+            "Consulta (somente SELECT):",
+            value='SELECT date_trunc(\'month\', Data) AS mes, sum(Estrangeiro) AS fluxo\n'
+                  'FROM fluxo_completo\nGROUP BY 1\nORDER BY 1',
+            height=150
+        )
+        if st.button("Executar consulta"):
+            try:
+                st.session_state["resultado_sql"] = executar_consulta(sql, "Dados", LIMITE_PADRAO, pasta_snapshot)
+            except Exception as e:
+                st.session_state.pop("resultado_sql", None)
+                st.error(f"Erro na consulta: {str(e)}")
+        
+        # O resultado fica na sessão para sobreviver à reexecução quando um snapshot novo é publicado
+        if "resultado_sql" in st.session_state:
+            resultado, truncado = st.session_state["resultado_sql"]
+            st.dataframe(resultado)
+            if truncado:
+                st.info(f"Resultado limitado às primeiras {LIMITE_PADRAO} linhas.")
 
 # ==============================
 ### Output para verificar os resultados
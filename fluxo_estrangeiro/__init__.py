@@ -0,0 +1,70 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3
+Coleta, processamento e análises do fluxo de investidores na B3.
+
+Importar o pacote não tem efeitos colaterais e não carrega pandas, NumPy nem
+as dependências pesadas: cada função pública é importada do seu módulo no
+primeiro acesso. Exemplo:
+
+    import fluxo_estrangeiro as fe
+
+    fluxo = fe.ler_processado("fluxo_completo", fe.snapshot_atual("Dados"))
+    diario, periodos, resumo = fe.calcular_regimes(fluxo)
+"""
+
+import importlib
+
+# Nome público -> módulo que o define
+_EXPORTACOES = {
+    # Coleta e processamento
+    "coletar_dados_fluxo": "coleta",
+    "coletar_cotacoes": "coleta",
+    "coletar_cotacoes_intraday": "coleta",
+    "resumir_sessoes": "coleta",
+    "executar_coleta": "coleta",
+    "mesclar_dados": "processamento",
+    "calcular_fluxo_acumulado": "processamento",
+    "calcular_matriz_anual": "processamento",
+    "processar_dados_para_analise": "processamento",
+    # Armazenamento e snapshots
+    "ler_tabela": "armazenamento",
+    "salvar_tabela": "armazenamento",
+    "tabela_existe": "armazenamento",
+    "snapshot_atual": "snapshots",
+    "versao_publicada": "snapshots",
+    "ler_metadados": "metadados",
+    "versao_snapshot": "metadados",
+    "ler_processado": "cache_arrow",
+    # Análises
+    "IndiceIntervalos": "intervalos",
+    "calcular_prefixos": "intervalos",
+    "atualizar_anomalias": "anomalias",
+    "calcular_perfil_lead_lag": "analise_lead_lag",
+    "correlacao_cruzada_fft": "analise_lead_lag",
+    "executar_backtest": "backtest",
+    "melhores_configuracoes": "backtest",
+    "curvas_patrimonio": "backtest",
+    "calcular_regimes": "regimes",
+    # Consultas e serviços
+    "executar_consulta": "consulta_sql",
+    "listar_tabelas": "consulta_sql",
+    "IndiceDados": "api_dados",
+    "servir": "api_dados",
+    "renderizar_graficos": "renderiza_graficos",
+}
+
+__all__ = sorted(_EXPORTACOES)
+
+
+def __getattr__(nome):
+    modulo = _EXPORTACOES.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f".{modulo}", __name__), nome)
+    # Acessos seguintes não passam mais por aqui
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,166 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Análise Lead/Lag
+Este script calcula correlações cruzadas entre o fluxo de cada categoria de
+investidor e os retornos do Ibovespa e do Dólar, para identificar se o fluxo
+antecede ou segue os movimentos do mercado.
+"""
+
+import os
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .constantes import CATEGORIAS
+from .snapshots import snapshot_atual
+
+SERIES_COTACOES = ["Ibovespa", "Dólar"]
+# Defasagem máxima padrão, em pregões (cerca de três meses)
+MAX_LAG_PADRAO = 60
+
+
+def correlacao_cruzada_fft(x, y, max_lag):
+    """Correlação cruzada normalizada entre x e y para lags de -max_lag a +max_lag.
+
+    Lag positivo k mede corr(x[t], y[t+k]), ou seja, x antecede y em k pregões.
+    O cálculo usa FFT, com custo O(n log n) para todos os lags de uma vez.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    max_lag = min(max_lag, n - 1)
+
+    x = x - x.mean()
+    y = y - y.mean()
+    escala = np.sqrt((x ** 2).sum() * (y ** 2).sum())
+
+    # Zero-padding para evitar a correlação circular
+    tamanho = 1 << int(np.ceil(np.log2(2 * n - 1)))
+    fx = np.fft.rfft(x, tamanho)
+    fy = np.fft.rfft(y, tamanho)
+    cc = np.fft.irfft(np.conj(fx) * fy, tamanho)
+
+    # cc[k] = sum x[t] * y[t+k]; lags negativos ficam no final do vetor
+    cc = np.concatenate([cc[-max_lag:], cc[:max_lag + 1]]) if max_lag > 0 else cc[:1]
+    if escala == 0:
+        return np.full(2 * max_lag + 1, np.nan)
+    return cc / escala
+
+
+def tamanho_bloco_padrao(n):
+    """Tamanho de bloco padrão do bootstrap para uma série de n pregões
+
+    Usa a regra n^(1/3) (Hall, Horowitz e Jing, 1995): cerca de 17 pregões
+    para 20 anos de dados.
+    """
+    return max(1, int(round(n ** (1 / 3))))
+
+
+def _reamostrar_blocos(y, tamanho_bloco, rng):
+    """Reamostragem circular por blocos móveis: concatena blocos de y sorteados"""
+    n = len(y)
+    inicios = rng.integers(0, n, size=-(-n // tamanho_bloco))
+    indices = (inicios[:, None] + np.arange(tamanho_bloco)).ravel()[:n] % n
+    return y[indices]
+
+
+def _replicas_bootstrap(args):
+    """Gera correlações cruzadas sob a hipótese nula reamostrando y em blocos
+
+    Os blocos preservam a autocorrelação de y mas desfazem o alinhamento com x.
+    """
+    x, y, max_lag, tamanho_bloco, n_replicas, semente = args
+    rng = np.random.default_rng(semente)
+    resultado = np.empty((n_replicas, 2 * max_lag + 1))
+    for i in range(n_replicas):
+        resultado[i] = correlacao_cruzada_fft(x, _reamostrar_blocos(y, tamanho_bloco, rng), max_lag)
+    return resultado
+
+
+def bandas_bootstrap(x, y, max_lag, n_boot=500, nivel=0.95, n_jobs=None, semente=42, executor=None,
+                     tamanho_bloco=None):
+    """Calcula bandas de confiança por bootstrap de blocos móveis, distribuídas entre os núcleos
+
+    Um embaralhamento simples de y supõe retornos independentes e estreita as
+    bandas quando há autocorrelação; por isso y é reamostrado em blocos de
+    `tamanho_bloco` pregões (padrão: tamanho_bloco_padrao). Um executor já
+    aberto pode ser reaproveitado entre vários pares de séries.
+    """
+    max_lag = min(max_lag, len(x) - 1)
+    tamanho_bloco = tamanho_bloco or tamanho_bloco_padrao(len(y))
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, n_boot))
+
+    # Divide as réplicas entre os processos, cada um com sua própria semente
+    tamanhos = [n_boot // n_jobs + (1 if i < n_boot % n_jobs else 0) for i in range(n_jobs)]
+    sementes = np.random.SeedSequence(semente).spawn(n_jobs)
+    tarefas = [(x, y, max_lag, tamanho_bloco, t, s) for t, s in zip(tamanhos, sementes) if t > 0]
+
+    if executor is not None:
+        replicas = list(executor.map(_replicas_bootstrap, tarefas))
+    elif n_jobs == 1:
+        replicas = [_replicas_bootstrap(t) for t in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            replicas = list(executor.map(_replicas_bootstrap, tarefas))
+
+    replicas = np.vstack(replicas)
+    alfa = (1 - nivel) / 2
+    inferior = np.nanquantile(replicas, alfa, axis=0)
+    superior = np.nanquantile(replicas, 1 - alfa, axis=0)
+    return inferior, superior
+
+
+def calcular_perfil_lead_lag(fluxo_completo, max_lag=MAX_LAG_PADRAO, n_boot=500, nivel=0.95, n_jobs=None):
+    """Calcula o perfil lead/lag de cada categoria contra cada série de cotações"""
+    dados = fluxo_completo.sort_values("Data").reset_index(drop=True)
+
+    # Correlaciona fluxo diário com retornos diários (e não com o nível das cotações)
+    retornos = dados[[s for s in SERIES_COTACOES if s in dados.columns]].pct_change()
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    perfis = []
+    # Um único pool de processos atende todos os pares categoria x cotação
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        for categoria in [c for c in CATEGORIAS if c in dados.columns]:
+            for serie in retornos.columns:
+                pares = pd.concat([dados[categoria], retornos[serie]], axis=1).dropna()
+                if len(pares) < 3:
+                    continue
+                x = pares.iloc[:, 0].to_numpy()
+                y = pares.iloc[:, 1].to_numpy()
+
+                lags_max = min(max_lag, len(pares) - 1)
+                correlacao = correlacao_cruzada_fft(x, y, lags_max)
+                inferior, superior = bandas_bootstrap(x, y, lags_max, n_boot, nivel, n_jobs,
+                                                      executor=executor)
+
+                perfis.append(pd.DataFrame({
+                    "Categoria": categoria,
+                    "Serie": serie,
+                    "Lag": np.arange(-lags_max, lags_max + 1),
+                    "Correlacao": correlacao,
+                    "Banda_Inferior": inferior,
+                    "Banda_Superior": superior,
+                }))
+
+    if not perfis:
+        return pd.DataFrame(columns=["Categoria", "Serie", "Lag", "Correlacao",
+                                     "Banda_Inferior", "Banda_Superior"])
+    return pd.concat(perfis, ignore_index=True)
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    today = datetime.date.today()
+    print(f"Iniciando análise lead/lag: {today}")
+
+    # Snapshots publicados são imutáveis: o perfil é gravado por 2_processa_dados.py
+    pasta = snapshot_atual("Dados")
+    fluxo_completo = pd.read_parquet(f"{pasta}/fluxo_completo.parquet")
+    perfil = calcular_perfil_lead_lag(fluxo_completo)
+    print(f"Perfil lead/lag calculado a partir de {pasta} ({len(perfil)} linhas)")
+    print(perfil.head(20))
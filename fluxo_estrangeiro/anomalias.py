@@ -0,0 +1,258 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Detecção de Fluxos Extremos
+Este script mantém, para cada categoria de investidor, o estado de uma
+janela móvel (mediana, MAD e percentis) e detecta dias de entrada ou saída
+extrema, sequências de dias no mesmo sentido e novos recordes.
+
+O estado é gravado entre execuções: cada novo pregão é processado uma única
+vez, com custo que depende apenas do tamanho da janela e não do tamanho do
+histórico. Para detectar revisões da fonte basta conferir o mês em aberto:
+no armazenamento segmentado os meses fechados nunca são regravados. Os
+eventos ficam em uma tabela ordenada por data.
+"""
+
+import os
+import json
+import bisect
+import datetime
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .armazenamento import modo_armazenamento
+from .constantes import CATEGORIAS
+from .metadados import hash_conteudo
+from .snapshots import snapshot_atual
+
+COLUNAS_EVENTOS = ["Data", "Categoria", "Tipo", "Valor", "Mediana", "MAD", "Z_Robusto",
+                   "Inicio", "Duracao", "Em_Andamento"]
+
+JANELA = 252
+MIN_OBSERVACOES = 60
+LIMIAR_Z = 3.5
+PERCENTIS = (5, 95)
+MIN_SEQUENCIA = 5
+VERSAO_ESTADO = 3
+
+
+class DetectorCategoria:
+    """Estado incremental de uma categoria: janela ordenada, sequência e recordes"""
+
+    def __init__(self, categoria, janela=JANELA):
+        self.categoria = categoria
+        self.janela = janela
+        self.valores = deque()
+        self.ordenados = []
+        self.sinal_sequencia = 0
+        self.inicio_sequencia = None
+        self.duracao_sequencia = 0
+        self.ultima_data = None
+        self.maximo = None
+        self.minimo = None
+
+    def estatisticas(self):
+        """Mediana, MAD e percentis da janela atual"""
+        ordenados = self.ordenados
+        n = len(ordenados)
+        # A janela já está ordenada: mediana e percentis são lidos por posição
+        mediana = float(ordenados[(n - 1) // 2] + ordenados[n // 2]) / 2
+        mad = float(np.median(np.abs(np.asarray(ordenados) - mediana)))
+        p_baixo = float(ordenados[int(PERCENTIS[0] / 100 * (n - 1))])
+        p_alto = float(ordenados[int(PERCENTIS[1] / 100 * (n - 1))])
+        return mediana, mad, p_baixo, p_alto
+
+    def atualizar(self, data, valor):
+        """Processa um novo pregão e retorna a lista de eventos gerados"""
+        eventos = []
+        base = {"Data": data, "Categoria": self.categoria, "Valor": valor,
+                "Mediana": np.nan, "MAD": np.nan, "Z_Robusto": np.nan,
+                "Inicio": data, "Duracao": 1, "Em_Andamento": False}
+
+        # O dia é comparado com a janela anterior, antes de entrar nela
+        if len(self.ordenados) >= MIN_OBSERVACOES:
+            mediana, mad, p_baixo, p_alto = self.estatisticas()
+            z = 0.6745 * (valor - mediana) / mad if mad > 0 else 0.0
+            base.update(Mediana=mediana, MAD=mad, Z_Robusto=z)
+            if z >= LIMIAR_Z and valor >= p_alto:
+                eventos.append({**base, "Tipo": "Entrada extrema"})
+            elif z <= -LIMIAR_Z and valor <= p_baixo:
+                eventos.append({**base, "Tipo": "Saída extrema"})
+
+        if self.maximo is not None and valor > self.maximo:
+            eventos.append({**base, "Tipo": "Recorde de entrada"})
+        if self.minimo is not None and valor < self.minimo:
+            eventos.append({**base, "Tipo": "Recorde de saída"})
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+
+        # Sequências de dias no mesmo sentido; registradas quando terminam
+        sinal = int(np.sign(valor))
+        if sinal != 0 and sinal == self.sinal_sequencia:
+            self.duracao_sequencia += 1
+        else:
+            evento = self.evento_sequencia(em_andamento=False)
+            if evento is not None:
+                eventos.append(evento)
+            self.sinal_sequencia = sinal
+            self.inicio_sequencia = data
+            self.duracao_sequencia = 1 if sinal != 0 else 0
+        self.ultima_data = data
+
+        # Atualiza a janela ordenada
+        self.valores.append(valor)
+        bisect.insort(self.ordenados, valor)
+        if len(self.valores) > self.janela:
+            antigo = self.valores.popleft()
+            del self.ordenados[bisect.bisect_left(self.ordenados, antigo)]
+        return eventos
+
+    def evento_sequencia(self, em_andamento):
+        """Evento da sequência atual, se tiver a duração mínima"""
+        if self.sinal_sequencia == 0 or self.duracao_sequencia < MIN_SEQUENCIA:
+            return None
+        tipo = "Sequência de entradas" if self.sinal_sequencia > 0 else "Sequência de saídas"
+        return {"Data": self.ultima_data, "Categoria": self.categoria, "Tipo": tipo,
+                "Valor": np.nan, "Mediana": np.nan, "MAD": np.nan, "Z_Robusto": np.nan,
+                "Inicio": self.inicio_sequencia, "Duracao": self.duracao_sequencia,
+                "Em_Andamento": em_andamento}
+
+    def para_dict(self):
+        """Serializa o estado para JSON"""
+        return {
+            "categoria": self.categoria,
+            "janela": self.janela,
+            "valores": list(self.valores),
+            "sinal_sequencia": self.sinal_sequencia,
+            "inicio_sequencia": self.inicio_sequencia,
+            "duracao_sequencia": self.duracao_sequencia,
+            "ultima_data": self.ultima_data,
+            "maximo": self.maximo,
+            "minimo": self.minimo,
+        }
+
+    @classmethod
+    def de_dict(cls, estado):
+        """Reconstrói o detector a partir do estado serializado"""
+        detector = cls(estado["categoria"], estado["janela"])
+        detector.valores = deque(estado["valores"])
+        detector.ordenados = sorted(estado["valores"])
+        detector.sinal_sequencia = estado["sinal_sequencia"]
+        detector.inicio_sequencia = estado["inicio_sequencia"]
+        detector.duracao_sequencia = estado["duracao_sequencia"]
+        detector.ultima_data = estado["ultima_data"]
+        detector.maximo = estado["maximo"]
+        detector.minimo = estado["minimo"]
+        return detector
+
+
+def _carregar_estado(caminho_estado, caminho_eventos):
+    """Carrega o estado salvo e os eventos já registrados (ou um estado vazio)"""
+    if not (os.path.exists(caminho_estado) and os.path.exists(caminho_eventos)):
+        return None, []
+    with open(caminho_estado, encoding="utf-8") as f:
+        estado = json.load(f)
+    if estado.get("versao") != VERSAO_ESTADO:
+        return None, []
+    eventos = pd.read_parquet(caminho_eventos)
+    eventos = eventos[~eventos["Em_Andamento"]]
+    if len(eventos) != estado.get("eventos"):
+        return None, []
+    for coluna in ["Data", "Inicio"]:
+        eventos[coluna] = eventos[coluna].dt.strftime("%Y-%m-%d")
+    return estado, eventos.to_dict("records")
+
+
+def _inicio_mes_aberto(datas, ultima_data):
+    """Posição do primeiro pregão do mês de `ultima_data` (a partir dela o histórico pode mudar)
+
+    No modo "arquivo" não há meses fechados e todo o histórico é conferido.
+    """
+    if modo_armazenamento() == "arquivo":
+        return 0
+    return int(datas.searchsorted(pd.Timestamp(ultima_data[:7] + "-01"), side="left"))
+
+
+def atualizar_anomalias(fluxo_completo, pasta="Dados", pasta_anterior=None):
+    """Processa apenas os pregões novos, grava o estado e retorna a tabela de eventos
+
+    O estado é lido de `pasta_anterior` (o snapshot publicado, por padrão a
+    própria `pasta`) e gravado em `pasta`. Se o histórico já processado
+    mudou (pregões incluídos, removidos ou valores revisados), o estado é
+    reconstruído do zero. Só o mês em aberto é conferido por hash; nos meses
+    anteriores basta conferir o número de pregões.
+    """
+    pasta_anterior = pasta if pasta_anterior is None else pasta_anterior
+    caminho_estado = os.path.join(pasta, "anomalias_estado.json")
+
+    dados = fluxo_completo.sort_values("Data").reset_index(drop=True)
+    categorias = [c for c in CATEGORIAS if c in dados.columns]
+    colunas_hash = ["Data"] + categorias
+
+    estado, eventos = _carregar_estado(os.path.join(pasta_anterior, "anomalias_estado.json"),
+                                       os.path.join(pasta_anterior, "anomalias.parquet"))
+    if estado is not None and estado["ultima_data"] is None:
+        estado, eventos = None, []
+    if estado is not None:
+        ja_processados = int(dados["Data"].searchsorted(pd.Timestamp(estado["ultima_data"]), side="right"))
+        inicio_aberto = _inicio_mes_aberto(dados["Data"], estado["ultima_data"])
+        if (ja_processados != estado["pregoes"] or estado["categorias"] != categorias
+                or inicio_aberto != estado["inicio_mes_aberto"]):
+            estado, eventos = None, []
+        elif hash_conteudo(dados[colunas_hash].iloc[inicio_aberto:ja_processados]) != estado["hash_mes_aberto"]:
+            # Revisões da fonte reescrevem valores de pregões já processados
+            estado, eventos = None, []
+
+    if estado is None:
+        detectores = {c: DetectorCategoria(c) for c in categorias}
+        inicio, pregoes = 0, 0
+    else:
+        detectores = {c: DetectorCategoria.de_dict(estado["detectores"][c]) for c in categorias}
+        inicio, pregoes = estado["pregoes"], estado["pregoes"]
+
+    # Apenas os pregões posteriores ao estado salvo são processados
+    novos = dados.iloc[inicio:]
+    datas = novos["Data"].dt.strftime("%Y-%m-%d")
+    for data, linha in zip(datas, novos[categorias].itertuples(index=False)):
+        for categoria, valor in zip(categorias, linha):
+            if pd.notna(valor):
+                eventos.extend(detectores[categoria].atualizar(data, float(valor)))
+        pregoes += 1
+
+    ultima_data = dados["Data"].iloc[-1].strftime("%Y-%m-%d") if len(dados) else None
+    inicio_aberto = _inicio_mes_aberto(dados["Data"], ultima_data) if ultima_data else 0
+    estado = {
+        "versao": VERSAO_ESTADO,
+        "ultima_data": ultima_data,
+        "pregoes": pregoes,
+        "inicio_mes_aberto": inicio_aberto,
+        "hash_mes_aberto": hash_conteudo(dados[colunas_hash].iloc[inicio_aberto:pregoes]),
+        "eventos": len(eventos),
+        "categorias": categorias,
+        "detectores": {c: d.para_dict() for c, d in detectores.items()},
+    }
+    with open(caminho_estado + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(caminho_estado + ".tmp", caminho_estado)
+
+    # Sequências ainda em andamento entram na tabela, mas não no estado persistido
+    andamento = [d.evento_sequencia(em_andamento=True) for d in detectores.values()]
+    tabela = pd.DataFrame(eventos + [e for e in andamento if e is not None], columns=COLUNAS_EVENTOS)
+    tabela["Data"] = pd.to_datetime(tabela["Data"])
+    tabela["Inicio"] = pd.to_datetime(tabela["Inicio"])
+    tabela["Duracao"] = tabela["Duracao"].astype(int)
+    tabela["Em_Andamento"] = tabela["Em_Andamento"].astype(bool)
+    tabela = tabela.sort_values(["Data", "Categoria", "Tipo"], kind="stable").reset_index(drop=True)
+    return tabela
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    print(f"Iniciando detecção de fluxos extremos: {datetime.date.today()}")
+    # Apenas consulta: o estado e os eventos são publicados por 2_processa_dados.py
+    pasta = snapshot_atual("Dados")
+    eventos = pd.read_parquet(os.path.join(pasta, "anomalias.parquet"))
+    print(f"Snapshot: {pasta}")
+    print(eventos.tail(20))
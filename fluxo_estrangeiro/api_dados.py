@@ -0,0 +1,291 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - API HTTP
+Este script expõe, somente para leitura, as séries processadas por
+2_processa_dados.py via HTTP, com cabeçalhos de cache (ETag/Last-Modified),
+compressão gzip e respostas em JSON ou Arrow.
+
+Rotas:
+    /diario                  Fluxo diário mesclado com as cotações
+    /acumulado               Fluxo acumulado em todo o período
+    /categoria/<nome>        Fluxo diário de uma categoria de investidor
+
+Parâmetros de consulta: inicio=AAAA-MM-DD, fim=AAAA-MM-DD, formato=json|arrow
+"""
+
+import os
+import io
+import gzip
+import json
+import hashlib
+import argparse
+import datetime
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+import numpy as np
+import pandas as pd
+
+from .constantes import CATEGORIAS
+from .intervalos import COLUNAS_FLUXO
+from .metadados import ler_metadados, versao_snapshot
+from .snapshots import snapshot_atual
+
+ARQUIVOS = {
+    "diario": "fluxo_completo.parquet",
+    "acumulado": "fluxo_total.parquet",
+}
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+# Rotas com colunas de fluxo acumuladas desde o início da série
+ROTAS_ACUMULADAS = {"acumulado"}
+
+
+class SnapshotDados:
+    """Tabelas de um único snapshot, indexadas por data; imutável depois de criado"""
+
+    def __init__(self, tabelas, datas, etag, ultima_modificacao):
+        self.tabelas = tabelas
+        self.datas = datas
+        self.etag = etag
+        self.ultima_modificacao = ultima_modificacao
+
+    def consultar(self, rota, inicio=None, fim=None, colunas=None):
+        """Retorna o recorte [inicio, fim] de uma tabela via busca binária nas datas
+
+        Nas rotas acumuladas, o fluxo é acumulado a partir de `inicio`: o valor
+        acumulado até o pregão anterior é subtraído do recorte.
+        """
+        tabela = self.tabelas[rota]
+        datas = self.datas[rota]
+        i = 0 if inicio is None else np.searchsorted(datas, np.datetime64(inicio), side="left")
+        j = len(datas) if fim is None else np.searchsorted(datas, np.datetime64(fim), side="right")
+        recorte = tabela.iloc[i:j]
+        if rota in ROTAS_ACUMULADAS and i > 0:
+            acumuladas = [c for c in COLUNAS_FLUXO if c in tabela.columns]
+            recorte = recorte.assign(**(recorte[acumuladas] - tabela[acumuladas].iloc[i - 1]))
+        if colunas is not None:
+            recorte = recorte[colunas]
+        return recorte
+
+    def etag_representacao(self, formato, codificacao):
+        """ETag forte de uma representação: varia com o formato e o Content-Encoding"""
+        return f'"{self.etag}-{formato}-{codificacao or "identity"}"'
+
+
+class IndiceDados:
+    """Mantém em memória o snapshot publicado das séries processadas"""
+
+    def __init__(self, pasta="Dados"):
+        self.pasta = pasta
+        self._trava = threading.Lock()
+        self._assinatura = None
+        self.snapshot = None
+
+    @staticmethod
+    def _assinatura_arquivos(pasta_snapshot):
+        """Identifica o snapshot lendo apenas o rodapé dos arquivos"""
+        assinatura = [pasta_snapshot]
+        for nome in sorted(ARQUIVOS.values()):
+            versao = versao_snapshot(f"{pasta_snapshot}/{nome}")
+            if versao is None:
+                raise FileNotFoundError(f"{pasta_snapshot}/{nome}")
+            assinatura.append((nome, versao))
+        return tuple(assinatura)
+
+    @staticmethod
+    def _ultima_modificacao(pasta_snapshot):
+        """Momento de geração do snapshot (ou, sem metadados, a data dos arquivos)"""
+        metadados = ler_metadados(f"{pasta_snapshot}/{ARQUIVOS['diario']}")
+        if metadados is not None:
+            return int(datetime.datetime.fromisoformat(metadados["gerado_em"]).timestamp())
+        return int(max(os.stat(f"{pasta_snapshot}/{nome}").st_mtime for nome in ARQUIVOS.values()))
+
+    def atualizar(self):
+        """Retorna o snapshot publicado, recarregando as tabelas apenas quando ele mudou
+
+        O ponteiro é resolvido uma vez por chamada; quem usa o objeto retornado
+        lê sempre um único snapshot, mesmo que outro seja publicado em seguida.
+        """
+        pasta_snapshot = snapshot_atual(self.pasta)
+        assinatura = self._assinatura_arquivos(pasta_snapshot)
+        if assinatura == self._assinatura:
+            return self.snapshot
+        with self._trava:
+            if assinatura == self._assinatura:
+                return self.snapshot
+            tabelas, datas = {}, {}
+            for rota, nome in ARQUIVOS.items():
+                tabela = pd.read_parquet(f"{pasta_snapshot}/{nome}")
+                tabela = tabela.sort_values("Data").reset_index(drop=True)
+                tabelas[rota] = tabela
+                datas[rota] = tabela["Data"].to_numpy()
+
+            # Base das ETags; cada representação acrescenta formato e codificação
+            etag = hashlib.sha1(repr(assinatura[1:]).encode()).hexdigest()
+            self.snapshot = SnapshotDados(tabelas, datas, etag, self._ultima_modificacao(pasta_snapshot))
+            self._assinatura = assinatura
+            return self.snapshot
+
+
+def aceita_codificacao(accept_encoding, codificacao):
+    """Indica se o cabeçalho Accept-Encoding aceita a codificação (q maior que zero)
+
+    A codificação vale pelo seu próprio q ou, se não estiver listada, pelo de
+    "*"; codificações não listadas não são aceitas.
+    """
+    qualidades = {}
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.partition(";")
+        nome = nome.strip().lower()
+        if not nome:
+            continue
+        q = 1.0
+        for parametro in parametros.split(";"):
+            chave, _, valor = parametro.partition("=")
+            if chave.strip().lower() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        qualidades[nome] = q
+    return qualidades.get(codificacao, qualidades.get("*", 0.0)) > 0
+
+
+def serializar(dados, formato):
+    """Serializa o recorte em JSON (registros) ou Arrow IPC stream"""
+    if formato == "arrow":
+        import pyarrow as pa
+
+        tabela = pa.Table.from_pandas(dados, preserve_index=False)
+        buffer = io.BytesIO()
+        with pa.ipc.new_stream(buffer, tabela.schema) as writer:
+            writer.write_table(tabela)
+        return buffer.getvalue(), TIPO_ARROW
+
+    corpo = dados.to_json(orient="records", date_format="iso", force_ascii=False)
+    return corpo.encode("utf-8"), "application/json; charset=utf-8"
+
+
+def criar_handler(indice):
+    """Cria a classe de handler HTTP ligada a um índice de dados"""
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "FluxoEstrangeiroAPI/1.0"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            partes = [unquote(p) for p in url.path.strip("/").split("/") if p]
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+            # Cada requisição usa um único snapshot do início ao fim
+            try:
+                snapshot = indice.atualizar()
+            except FileNotFoundError:
+                return self._erro(503, "Dados processados não encontrados")
+
+            if partes in (["diario"], ["acumulado"]):
+                rota, colunas = partes[0], None
+            elif len(partes) == 2 and partes[0] == "categoria" and partes[1] in CATEGORIAS:
+                rota = "diario"
+                if partes[1] not in snapshot.tabelas[rota].columns:
+                    return self._erro(404, f"Categoria sem dados: {partes[1]}")
+                colunas = ["Data", partes[1]]
+            else:
+                return self._erro(404, "Rota não encontrada")
+
+            try:
+                inicio = pd.Timestamp(params["inicio"]) if "inicio" in params else None
+                fim = pd.Timestamp(params["fim"]) if "fim" in params else None
+            except ValueError:
+                return self._erro(400, "Datas devem estar no formato AAAA-MM-DD")
+
+            formato = params.get("formato")
+            if formato is None:
+                formato = "arrow" if TIPO_ARROW in self.headers.get("Accept", "") else "json"
+            if formato not in ("json", "arrow"):
+                return self._erro(400, "Formato deve ser 'json' ou 'arrow'")
+
+            # Cada formato e codificação é uma representação diferente, com ETag própria
+            etag = snapshot.etag_representacao(formato, self._codificacao())
+
+            # Requisições condicionais respondem 304 sem tocar nos dados
+            if self._nao_modificado(snapshot, etag):
+                self.send_response(304)
+                self._cabecalhos_cache(snapshot, etag)
+                self.end_headers()
+                return
+
+            corpo, tipo = serializar(snapshot.consultar(rota, inicio, fim, colunas), formato)
+            self._responder(200, corpo, tipo, snapshot, etag)
+
+        def _codificacao(self):
+            return "gzip" if aceita_codificacao(self.headers.get("Accept-Encoding", ""), "gzip") else None
+
+        def _nao_modificado(self, snapshot, etag):
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                etags = [e.strip() for e in if_none_match.split(",")]
+                return etag in etags or "*" in etags
+            if_modified_since = self.headers.get("If-Modified-Since")
+            if if_modified_since:
+                try:
+                    data = parsedate_to_datetime(if_modified_since)
+                except (TypeError, ValueError):
+                    return False
+                return snapshot.ultima_modificacao <= data.timestamp()
+            return False
+
+        def _cabecalhos_cache(self, snapshot, etag):
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(snapshot.ultima_modificacao, usegmt=True))
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept, Accept-Encoding")
+
+        def _responder(self, status, corpo, tipo, snapshot=None, etag=None):
+            codificacao = self._codificacao()
+            if codificacao == "gzip":
+                corpo = gzip.compress(corpo, compresslevel=5)
+
+            self.send_response(status)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+            if codificacao:
+                self.send_header("Content-Encoding", codificacao)
+            if snapshot is not None:
+                self._cabecalhos_cache(snapshot, etag)
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def _erro(self, status, mensagem):
+            corpo = json.dumps({"erro": mensagem}, ensure_ascii=False).encode("utf-8")
+            self._responder(status, corpo, "application/json; charset=utf-8")
+
+    return Handler
+
+
+def servir(pasta="Dados", host="127.0.0.1", porta=8000):
+    """Inicia o servidor HTTP somente leitura"""
+    indice = IndiceDados(pasta)
+    servidor = ThreadingHTTPServer((host, porta), criar_handler(indice))
+    print(f"API de dados em http://{host}:{porta} (pasta: {pasta})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP somente leitura das séries processadas")
+    parser.add_argument("--pasta", default="Dados")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    args = parser.parse_args()
+
+    print(f"Iniciando API de dados: {datetime.date.today()}")
+    servir(args.pasta, args.host, args.porta)
@@ -0,0 +1,193 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Armazenamento
+Este script grava e lê as tabelas coletadas na pasta Dados.
+
+No modo "segmentado" (padrão) cada tabela vira uma pasta Dados/<nome>/ com
+um arquivo Parquet imutável por mês e um manifest.json pequeno apontando
+para os segmentos atuais. Meses fechados nunca são regravados e o mês em
+aberto só é regravado quando o seu conteúdo muda, de modo que o commit
+diário da base altera apenas alguns kilobytes.
+
+No modo "arquivo" cada tabela continua sendo um único Dados/<nome>.parquet.
+O modo é escolhido pela variável de ambiente FLUXO_ARMAZENAMENTO.
+
+Coletas simultâneas (várias sessões clicando em "Atualizar Dados") são
+serializadas por uma trava por tabela, e cada arquivo é gravado em um
+temporário com nome único antes de substituir o definitivo.
+"""
+
+import os
+import json
+import tempfile
+
+import pandas as pd
+
+from .metadados import hash_conteudo
+from .travas import trava_arquivo
+
+MODO_PADRAO = "segmentado"
+MODOS = ("segmentado", "arquivo")
+MANIFEST = "manifest.json"
+TRAVA = ".trava"
+
+
+def modo_armazenamento():
+    """Retorna o modo de armazenamento configurado"""
+    modo = os.environ.get("FLUXO_ARMAZENAMENTO", MODO_PADRAO)
+    if modo not in MODOS:
+        raise ValueError(f"FLUXO_ARMAZENAMENTO inválido: {modo!r} (use {' ou '.join(MODOS)})")
+    return modo
+
+
+def ler_manifest(nome, pasta="Dados"):
+    """Lê o manifest de uma tabela segmentada (None se não existir)"""
+    caminho = os.path.join(pasta, nome, MANIFEST)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def arquivos_segmentos(nome, pasta="Dados"):
+    """Lista os arquivos de segmento atuais de uma tabela, em ordem cronológica"""
+    manifest = ler_manifest(nome, pasta)
+    if manifest is None:
+        return []
+    return [os.path.join(pasta, nome, s["arquivo"]) for s in manifest["segmentos"]]
+
+
+def _temporario(caminho):
+    """Cria um arquivo temporário com nome único ao lado de `caminho`"""
+    descritor, temporario = tempfile.mkstemp(prefix=os.path.basename(caminho) + ".", suffix=".tmp",
+                                             dir=os.path.dirname(caminho))
+    os.close(descritor)
+    # mkstemp cria com permissão 0600; os dados devem ser legíveis por outros processos
+    os.chmod(temporario, 0o644)
+    return temporario
+
+
+def _substituir(temporario, caminho):
+    """Move o temporário sobre o definitivo, removendo-o se a troca falhar"""
+    try:
+        os.replace(temporario, caminho)
+    except OSError:
+        os.remove(temporario)
+        raise
+
+
+def _gravar_manifest(nome, pasta, manifest):
+    """Grava o manifest de forma atômica, apenas se o conteúdo mudou"""
+    caminho = os.path.join(pasta, nome, MANIFEST)
+    conteudo = json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            if f.read() == conteudo:
+                return
+    temporario = _temporario(caminho)
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    _substituir(temporario, caminho)
+
+
+def salvar_segmentado(dados, nome, pasta="Dados", coluna_data="Data"):
+    """Grava a tabela em segmentos mensais, regravando apenas o que mudou
+
+    Linhas de meses fechados já gravados são preservadas mesmo que não
+    apareçam mais nos dados novos (as fontes só publicam uma janela recente).
+    """
+    pasta_tabela = os.path.join(pasta, nome)
+    os.makedirs(pasta_tabela, exist_ok=True)
+    # O manifest é lido, alterado e regravado: uma coleta por vez em cada tabela
+    with trava_arquivo(os.path.join(pasta_tabela, TRAVA)):
+        return _mesclar_segmentos(dados, nome, pasta, coluna_data)
+
+
+def _mesclar_segmentos(dados, nome, pasta, coluna_data):
+    """Mescla os dados novos aos segmentos atuais e regrava o manifest (com a trava)"""
+    pasta_tabela = os.path.join(pasta, nome)
+    manifest = ler_manifest(nome, pasta)
+    if manifest is None:
+        manifest = {"tabela": nome, "periodo": "mes", "segmentos": []}
+        # Migração: incorpora o histórico do arquivo único, se existir
+        legado = os.path.join(pasta, f"{nome}.parquet")
+        if os.path.exists(legado):
+            dados = pd.concat([pd.read_parquet(legado), dados], ignore_index=True)
+
+    dados = dados.dropna(subset=[coluna_data])
+    dados = dados.drop_duplicates(subset=[coluna_data], keep="last")
+    dados = dados.sort_values(coluna_data).reset_index(drop=True)
+    if dados.empty:
+        return manifest
+
+    periodos = dados[coluna_data].dt.strftime("%Y-%m")
+    periodo_aberto = periodos.iloc[-1]
+    segmentos = {s["periodo"]: s for s in manifest["segmentos"]}
+
+    for periodo, segmento in dados.groupby(periodos, sort=True):
+        atual = segmentos.get(periodo)
+        if atual is not None and atual["fechado"]:
+            continue
+
+        arquivo = f"{nome}_{periodo}.parquet"
+        caminho = os.path.join(pasta_tabela, arquivo)
+        if atual is not None and os.path.exists(caminho):
+            # Segmento em aberto: novos valores substituem os antigos na mesma data
+            segmento = pd.concat([pd.read_parquet(caminho), segmento], ignore_index=True)
+            segmento = segmento.drop_duplicates(subset=[coluna_data], keep="last")
+            segmento = segmento.sort_values(coluna_data)
+        segmento = segmento.reset_index(drop=True)
+
+        fechado = periodo < periodo_aberto
+        hash_segmento = hash_conteudo(segmento)
+        if atual is None or atual["hash"] != hash_segmento or not os.path.exists(caminho):
+            temporario = _temporario(caminho)
+            try:
+                segmento.to_parquet(temporario, index=False)
+            except Exception:
+                os.remove(temporario)
+                raise
+            _substituir(temporario, caminho)
+
+        segmentos[periodo] = {
+            "periodo": periodo,
+            "arquivo": arquivo,
+            "linhas": int(len(segmento)),
+            "hash": hash_segmento,
+            "fechado": fechado,
+        }
+
+    manifest["segmentos"] = [segmentos[p] for p in sorted(segmentos)]
+    _gravar_manifest(nome, pasta, manifest)
+    return manifest
+
+
+def ler_segmentado(nome, pasta="Dados"):
+    """Lê todos os segmentos de uma tabela como um único DataFrame"""
+    arquivos = arquivos_segmentos(nome, pasta)
+    if not arquivos:
+        raise FileNotFoundError(f"Tabela segmentada não encontrada: {os.path.join(pasta, nome)}")
+    return pd.concat([pd.read_parquet(a) for a in arquivos], ignore_index=True)
+
+
+def salvar_tabela(dados, nome, pasta="Dados"):
+    """Grava uma tabela coletada no modo de armazenamento configurado"""
+    if modo_armazenamento() == "segmentado":
+        salvar_segmentado(dados, nome, pasta)
+        return os.path.join(pasta, nome, MANIFEST)
+    caminho = os.path.join(pasta, f"{nome}.parquet")
+    dados.to_parquet(caminho)
+    return caminho
+
+
+def ler_tabela(nome, pasta="Dados"):
+    """Lê uma tabela coletada, usando o outro formato se o configurado não existir"""
+    segmentado = ler_manifest(nome, pasta) is not None
+    arquivo = os.path.join(pasta, f"{nome}.parquet")
+    if segmentado and (modo_armazenamento() == "segmentado" or not os.path.exists(arquivo)):
+        return ler_segmentado(nome, pasta)
+    return pd.read_parquet(arquivo)
+
+
+def tabela_existe(nome, pasta="Dados"):
+    """Indica se a tabela existe em algum dos formatos"""
+    return ler_manifest(nome, pasta) is not None or os.path.exists(os.path.join(pasta, f"{nome}.parquet"))
@@ -0,0 +1,243 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Backtest de Sinais de Fluxo
+Este script avalia regras de momentum e de reversão do fluxo sobre grades de
+janelas e limiares, para medir se o fluxo de cada categoria antecede o
+Ibovespa.
+
+O sinal de cada janela é a soma do fluxo nos últimos pregões, padronizada
+pelo desvio padrão móvel do fluxo diário. As somas de todas as janelas saem
+das somas acumuladas de uma só vez, e as posições, retornos e estatísticas de
+toda a grade janela x limiar x regra são calculados por broadcasting do
+NumPy. Grades grandes são divididas em blocos de janelas entre processos.
+
+Regras (a posição definida no fechamento de um pregão vale para o seguinte):
+    Momentum   comprado quando o sinal passa do limiar, vendido abaixo de -limiar
+    Reversão   o contrário
+"""
+
+import os
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .constantes import CATEGORIAS
+from .snapshots import snapshot_atual
+
+REGRAS = ["Momentum", "Reversão"]
+JANELAS_PADRAO = np.arange(1, 61)
+LIMIARES_PADRAO = np.round(np.arange(0, 3.01, 0.1), 2)
+COLUNAS_RESULTADO = ["Categoria", "Regra", "Janela", "Limiar", "Retorno_Total", "Retorno_Anual",
+                     "Volatilidade", "Sharpe", "Max_Drawdown", "Operacoes", "Exposicao", "Acerto"]
+
+JANELA_VOLATILIDADE = 252
+MIN_OBSERVACOES = 60
+CUSTO_PADRAO = 0.0005
+PREGOES_ANO = 252
+# Acima deste número de células (combinações x pregões) a grade vai para o pool de processos
+LIMITE_PARALELO = 5_000_000
+CELULAS_POR_BLOCO = 2_000_000
+
+
+def preparar_series(fluxo_completo, categoria="Estrangeiro"):
+    """Datas, fluxo diário e retornos diários do Ibovespa, ordenados por data"""
+    dados = fluxo_completo[["Data", categoria, "Ibovespa"]].dropna(subset=["Ibovespa"])
+    dados = dados.sort_values("Data").reset_index(drop=True)
+    fluxo = dados[categoria].fillna(0).to_numpy(dtype=float)
+    retornos = dados["Ibovespa"].pct_change().fillna(0).to_numpy(dtype=float)
+    return dados["Data"].to_numpy(), fluxo, retornos
+
+
+def sinais_padronizados(fluxo, janelas):
+    """Sinal (janelas x pregões): soma do fluxo na janela dividida pelo desvio esperado
+
+    O desvio usa apenas pregões até a data do sinal; janelas incompletas e
+    pregões sem histórico suficiente ficam como NaN (sem posição).
+    """
+    janelas = np.asarray(janelas, dtype=int)
+    n = len(fluxo)
+    somas = np.concatenate([[0.0], np.cumsum(fluxo)])
+
+    # Soma de (t - janela, t] = somas[t + 1] - somas[t + 1 - janela], para todas as janelas
+    fim = np.arange(1, n + 1)
+    inicio = fim[None, :] - janelas[:, None]
+    soma_janela = somas[fim][None, :] - somas[np.clip(inicio, 0, None)]
+    soma_janela[inicio < 0] = np.nan
+
+    desvio = pd.Series(fluxo).rolling(JANELA_VOLATILIDADE, min_periods=MIN_OBSERVACOES).std().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sinal = soma_janela / (desvio[None, :] * np.sqrt(janelas)[:, None])
+    sinal[~np.isfinite(sinal)] = np.nan
+    return sinal
+
+
+def _posicoes(sinal, limiares, vendido):
+    """Posições (regras x janelas x limiares x pregões) para um bloco de sinais"""
+    # Comparações com NaN são falsas: sem sinal, sem posição
+    with np.errstate(invalid="ignore"):
+        acima = (sinal[:, None, :] > limiares[None, :, None]).astype(np.int8)
+        abaixo = (sinal[:, None, :] < -limiares[None, :, None]).astype(np.int8)
+    if vendido:
+        momentum, reversao = acima - abaixo, abaixo - acima
+    else:
+        momentum, reversao = acima, abaixo
+    return np.stack([momentum, reversao])
+
+
+def estatisticas(retornos_estrategia, posicoes):
+    """Estatísticas de desempenho ao longo do último eixo (pregões)"""
+    n = retornos_estrategia.shape[-1]
+    log_patrimonio = np.cumsum(np.log1p(retornos_estrategia), axis=-1)
+    retorno_total = np.expm1(log_patrimonio[..., -1])
+    anos = n / PREGOES_ANO
+    retorno_anual = (1 + retorno_total) ** (1 / anos) - 1
+
+    media = retornos_estrategia.mean(axis=-1)
+    desvio = retornos_estrategia.std(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(desvio > 0, media / desvio * np.sqrt(PREGOES_ANO), np.nan)
+
+    # Drawdown sobre o patrimônio, com o pico começando no capital inicial
+    pico = np.maximum(np.maximum.accumulate(log_patrimonio, axis=-1), 0)
+    max_drawdown = np.expm1((log_patrimonio - pico).min(axis=-1))
+
+    posicionado = posicoes != 0
+    dias_posicionado = posicionado.sum(axis=-1)
+    operacoes = (np.diff(posicoes, axis=-1, prepend=0) != 0).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acerto = np.where(dias_posicionado > 0,
+                          ((retornos_estrategia > 0) & posicionado).sum(axis=-1) / dias_posicionado, np.nan)
+
+    return {
+        "Retorno_Total": retorno_total,
+        "Retorno_Anual": retorno_anual,
+        "Volatilidade": desvio * np.sqrt(PREGOES_ANO),
+        "Sharpe": sharpe,
+        "Max_Drawdown": max_drawdown,
+        "Operacoes": operacoes,
+        "Exposicao": posicionado.mean(axis=-1),
+        "Acerto": acerto,
+    }
+
+
+def _avaliar_bloco(args):
+    """Avalia toda a grade limiar x regra para um bloco de janelas"""
+    sinal, retornos, limiares, custo, vendido = args
+    posicoes = _posicoes(sinal, limiares, vendido)
+
+    # A posição do fechamento t rende o retorno de t + 1; trocas de posição pagam custo
+    posicao_vigente = posicoes[..., :-1]
+    trocas = np.abs(np.diff(posicoes, axis=-1, prepend=0))[..., :-1]
+    retornos_estrategia = posicao_vigente * retornos[1:] - trocas * custo
+    return estatisticas(retornos_estrategia, posicao_vigente)
+
+
+def executar_backtest(fluxo_completo, categoria="Estrangeiro", janelas=JANELAS_PADRAO,
+                      limiares=LIMIARES_PADRAO, custo=CUSTO_PADRAO, vendido=True,
+                      n_jobs=None, executor=None):
+    """Avalia as regras de momentum e reversão em toda a grade janela x limiar
+
+    Retorna uma linha por combinação (regra, janela, limiar) com as
+    estatísticas de desempenho. Um executor já aberto pode ser reaproveitado
+    entre categorias.
+    """
+    janelas = np.asarray(janelas, dtype=int)
+    limiares = np.asarray(limiares, dtype=float)
+    _, fluxo, retornos = preparar_series(fluxo_completo, categoria)
+    if len(fluxo) < 2:
+        return pd.DataFrame(columns=COLUNAS_RESULTADO)
+    sinal = sinais_padronizados(fluxo, janelas)
+
+    # Blocos de janelas com tamanho limitado para conter a memória de cada tarefa
+    celulas_por_janela = len(REGRAS) * len(limiares) * len(fluxo)
+    por_bloco = max(1, CELULAS_POR_BLOCO // celulas_por_janela)
+    tarefas = [(sinal[i:i + por_bloco], retornos, limiares, custo, vendido)
+               for i in range(0, len(janelas), por_bloco)]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    paralelo = celulas_por_janela * len(janelas) > LIMITE_PARALELO and len(tarefas) > 1
+    if executor is not None and paralelo:
+        blocos = list(executor.map(_avaliar_bloco, tarefas))
+    elif n_jobs == 1 or not paralelo:
+        blocos = [_avaliar_bloco(t) for t in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tarefas))) as executor:
+            blocos = list(executor.map(_avaliar_bloco, tarefas))
+
+    # Cada estatística tem forma (regras, janelas, limiares); a ordem das linhas segue essa grade
+    regra, janela, limiar = np.meshgrid(REGRAS, janelas, limiares, indexing="ij")
+    resultado = pd.DataFrame({
+        "Categoria": categoria,
+        "Regra": regra.ravel(),
+        "Janela": janela.ravel(),
+        "Limiar": limiar.ravel(),
+    })
+    for coluna in COLUNAS_RESULTADO[4:]:
+        resultado[coluna] = np.concatenate([b[coluna] for b in blocos], axis=1).ravel()
+    return resultado
+
+
+def executar_backtest_categorias(fluxo_completo, n_jobs=None, **kwargs):
+    """Executa o backtest de cada categoria presente, com um único pool de processos"""
+    n_jobs = n_jobs or os.cpu_count() or 1
+    resultados = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        for categoria in [c for c in CATEGORIAS if c in fluxo_completo.columns]:
+            resultados.append(executar_backtest(fluxo_completo, categoria, n_jobs=n_jobs,
+                                                executor=executor, **kwargs))
+    if not resultados:
+        return pd.DataFrame(columns=COLUNAS_RESULTADO)
+    return pd.concat(resultados, ignore_index=True)
+
+
+def melhores_configuracoes(resultados, n=10, criterio="Sharpe", min_operacoes=10):
+    """Seleciona as n melhores combinações pelo critério, ignorando as que quase não operam"""
+    candidatos = resultados[resultados["Operacoes"] >= min_operacoes]
+    return candidatos.sort_values(criterio, ascending=False, na_position="last").head(n)
+
+
+def curvas_patrimonio(fluxo_completo, configuracoes, custo=CUSTO_PADRAO, vendido=True):
+    """Curvas de patrimônio (base 1) das configurações e do Ibovespa comprado e mantido
+
+    `configuracoes` tem as colunas Categoria, Regra, Janela e Limiar.
+    Retorna uma tabela com Data e uma coluna por curva.
+    """
+    curvas = {}
+    datas = None
+    for config in configuracoes.itertuples(index=False):
+        datas, fluxo, retornos = preparar_series(fluxo_completo, config.Categoria)
+        sinal = sinais_padronizados(fluxo, [config.Janela])
+        posicoes = _posicoes(sinal, np.array([config.Limiar]), vendido)[REGRAS.index(config.Regra), 0, 0]
+        trocas = np.abs(np.diff(posicoes, prepend=0))[:-1]
+        retornos_estrategia = np.concatenate([[0.0], posicoes[:-1] * retornos[1:] - trocas * custo])
+        nome = f"{config.Categoria} | {config.Regra} | {config.Janela}d | {config.Limiar:.1f}σ"
+        curvas[nome] = np.cumprod(1 + retornos_estrategia)
+
+    if datas is None:
+        datas, _, retornos = preparar_series(fluxo_completo)
+    curvas["Ibovespa (comprado e mantido)"] = np.cumprod(1 + retornos)
+    return pd.DataFrame({"Data": datas, **curvas})
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest de regras de fluxo sobre grades de parâmetros")
+    parser.add_argument("--pasta", default="Dados")
+    parser.add_argument("--categoria", default="Estrangeiro", choices=CATEGORIAS)
+    parser.add_argument("--custo", type=float, default=CUSTO_PADRAO, help="Custo por troca de posição")
+    parser.add_argument("--somente-comprado", action="store_true", help="Não permite posições vendidas")
+    parser.add_argument("--processos", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"Iniciando backtest: {datetime.date.today()}")
+    fluxo_completo = pd.read_parquet(f"{snapshot_atual(args.pasta)}/fluxo_completo.parquet")
+    inicio = datetime.datetime.now()
+    resultados = executar_backtest(fluxo_completo, args.categoria, custo=args.custo,
+                                   vendido=not args.somente_comprado, n_jobs=args.processos)
+    duracao = (datetime.datetime.now() - inicio).total_seconds()
+    print(f"{len(resultados)} combinações avaliadas em {duracao:.2f}s")
+    print(melhores_configuracoes(resultados).to_string(index=False))
@@ -0,0 +1,74 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Cache Arrow
+Este script publica e lê a cópia "quente" das tabelas processadas em Arrow
+IPC (Feather v2) sem compressão, na pasta hot/ de cada snapshot.
+
+A leitura é feita por memory-map: os workers da aplicação compartilham as
+páginas do arquivo pelo page cache do sistema operacional e não precisam
+descompactar nem decodificar o Parquet. Os arquivos Parquet continuam sendo
+a fonte canônica; a cópia Arrow só é usada se for do mesmo snapshot.
+"""
+
+import os
+import json
+
+import pandas as pd
+import pyarrow as pa
+
+from .metadados import CHAVE_METADADOS, gravar_parquet
+
+PASTA_HOT = "hot"
+
+
+def caminho_cache_arrow(nome, pasta="Dados"):
+    """Caminho da cópia Arrow de uma tabela processada"""
+    return os.path.join(pasta, PASTA_HOT, f"{nome}.arrow")
+
+
+def publicar_cache_arrow(dados, nome, pasta="Dados", metadados=None):
+    """Grava a cópia Arrow sem compressão, substituindo a anterior de forma atômica
+
+    Leitores que já mapearam a versão anterior continuam com ela até reabrir.
+    """
+    os.makedirs(os.path.join(pasta, PASTA_HOT), exist_ok=True)
+    tabela = pa.Table.from_pandas(dados)
+    if metadados is not None:
+        metadados_schema = dict(tabela.schema.metadata or {})
+        metadados_schema[CHAVE_METADADOS] = json.dumps(metadados, ensure_ascii=False).encode("utf-8")
+        tabela = tabela.replace_schema_metadata(metadados_schema)
+
+    caminho = caminho_cache_arrow(nome, pasta)
+    temporario = caminho + ".tmp"
+    with pa.OSFile(temporario, "wb") as arquivo:
+        with pa.ipc.new_file(arquivo, tabela.schema) as writer:
+            writer.write_table(tabela)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def ler_cache_arrow(nome, pasta="Dados", versao=None):
+    """Lê a cópia Arrow por memory-map; retorna None se ausente ou de outro snapshot"""
+    caminho = caminho_cache_arrow(nome, pasta)
+    if not os.path.exists(caminho):
+        return None
+
+    leitor = pa.ipc.open_file(pa.memory_map(caminho, "r"))
+    if versao is not None:
+        metadados = (leitor.schema.metadata or {}).get(CHAVE_METADADOS)
+        if metadados is None or json.loads(metadados.decode("utf-8")).get("hash") != versao:
+            return None
+    return leitor.read_all().to_pandas(split_blocks=True)
+
+
+def salvar_processado(dados, nome, pasta="Dados", metadados=None):
+    """Grava a tabela processada em Parquet (canônico) e publica a cópia Arrow"""
+    gravar_parquet(dados, os.path.join(pasta, f"{nome}.parquet"), metadados)
+    publicar_cache_arrow(dados, nome, pasta, metadados)
+
+
+def ler_processado(nome, pasta="Dados", versao=None):
+    """Lê uma tabela processada pela cópia Arrow do mesmo snapshot, ou pelo Parquet"""
+    dados = ler_cache_arrow(nome, pasta, versao)
+    if dados is None:
+        dados = pd.read_parquet(os.path.join(pasta, f"{nome}.parquet"))
+    return dados
@@ -0,0 +1,232 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Coleta de Dados
+Este módulo coleta dados de fluxo estrangeiro e cotações do mercado financeiro.
+
+requests e yfinance só são importados pelas funções que acessam a rede; o
+resumo das barras intraday usa apenas pandas e NumPy.
+"""
+
+import os
+import datetime
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from .armazenamento import salvar_tabela
+from .constantes import CATEGORIAS
+
+
+def criar_pasta_dados(pasta="Dados"):
+    if not os.path.exists(pasta):
+        os.makedirs(pasta)
+    return pasta
+
+
+def coletar_dados_fluxo():
+    import requests
+
+    url = "https://www.dadosdemercado.com.br/fluxo"
+    response = requests.get(url, timeout=15)
+    response.raise_for_status()
+
+    tabelas = pd.read_html(StringIO(response.text))
+    if not tabelas:
+        raise ValueError("Nenhuma tabela encontrada na pagina de fluxo")
+    dados_da_bolsa = tabelas[0]
+
+    expected_cols = ["Estrangeiro", "Inst. Financeira", "Pessoa fisica", "Institucional", "Outros"]
+    alt_cols = {"Pessoa fisica": "Pessoa física"}
+
+    for col in expected_cols:
+        real_col = alt_cols.get(col, col)
+        match = next((c for c in dados_da_bolsa.columns if c.strip() == real_col or c.strip() == col), None)
+        if match:
+            dados_da_bolsa[match] = dados_da_bolsa[match].astype(str).str.replace("mi", "", regex=False).str.strip()
+        else:
+            dados_da_bolsa[real_col] = pd.NA
+
+    if "Data" not in dados_da_bolsa.columns:
+        raise KeyError(f"Coluna 'Data' nao encontrada. Colunas: {list(dados_da_bolsa.columns)}")
+
+    dados_da_bolsa["Data"] = pd.to_datetime(dados_da_bolsa["Data"], dayfirst=True, errors='coerce')
+    dados_da_bolsa = dados_da_bolsa.sort_values(by="Data")
+
+    float_cols = [c for c in dados_da_bolsa.columns if c in CATEGORIAS]
+    for column in float_cols:
+        s = dados_da_bolsa[column].astype(str) \
+            .str.replace(".", "", regex=False) \
+            .str.replace(",", ".", regex=False)
+        dados_da_bolsa[column] = pd.to_numeric(s, errors='coerce')
+
+    return dados_da_bolsa
+
+
+def coletar_cotacoes(dados_da_bolsa):
+    if "Data" not in dados_da_bolsa.columns or dados_da_bolsa["Data"].dropna().empty:
+        raise ValueError("dados_da_bolsa nao contem datas validas")
+
+    import yfinance as yf
+
+    primeiro_registro = dados_da_bolsa["Data"].dropna().iloc[0]
+    data_busca = primeiro_registro - pd.Timedelta(days=1)
+
+    cotacoes_raw = yf.download(
+        ["^BVSP", "BRL=X"],
+        start=data_busca,
+        auto_adjust=False,
+        progress=False
+    )
+
+    print(f"yfinance colunas: {list(cotacoes_raw.columns)}")
+
+    # Extrai 'Adj Close' se disponivel, senao usa 'Close'
+    if "Adj Close" in cotacoes_raw.columns:
+        adj = cotacoes_raw["Adj Close"]
+    elif "Close" in cotacoes_raw.columns:
+        adj = cotacoes_raw["Close"]
+    else:
+        adj = cotacoes_raw
+
+    cotacoes_pd = adj.reset_index()
+
+    # Achata MultiIndex se necessario
+    if isinstance(cotacoes_pd.columns, pd.MultiIndex):
+        cotacoes_pd.columns = [" ".join(str(s) for s in col).strip() for col in cotacoes_pd.columns]
+
+    print(f"Colunas apos reset_index: {list(cotacoes_pd.columns)}")
+
+    cols = cotacoes_pd.columns.tolist()
+    rename_map = {cols[0]: "Data"}
+    for c in cols[1:]:
+        name = str(c)
+        if "BRL=X" in name or ("BRL" in name and "BVSP" not in name):
+            rename_map[c] = "Dolar"
+        if "^BVSP" in name or "BVSP" in name:
+            rename_map[c] = "Ibovespa"
+
+    cotacoes_pd = cotacoes_pd.rename(columns=rename_map)
+
+    # Renomeia Dolar para Dólar
+    if "Dolar" in cotacoes_pd.columns:
+        cotacoes_pd = cotacoes_pd.rename(columns={"Dolar": "Dólar"})
+
+    cotacoes_pd = cotacoes_pd.dropna(how='all')
+
+    cotacoes_pd["Data"] = pd.to_datetime(cotacoes_pd["Data"], errors='coerce')
+    if cotacoes_pd["Data"].dt.tz is not None:
+        cotacoes_pd["Data"] = cotacoes_pd["Data"].dt.tz_convert(None)
+
+    print(f"Cotacoes coletadas: {cotacoes_pd.shape}, colunas: {list(cotacoes_pd.columns)}")
+    return cotacoes_pd
+
+
+TICKERS_INTRADAY = {"^BVSP": "Ibovespa", "BRL=X": "Dólar"}
+
+# Limites de historico do Yahoo Finance por intervalo e tamanho de cada bloco baixado
+LIMITE_DIAS_INTRADAY = {"1m": 29, "5m": 59, "15m": 59, "30m": 59, "1h": 729}
+DIAS_POR_BLOCO = {"1m": 7, "5m": 20, "15m": 20, "30m": 20, "1h": 60}
+
+
+def baixar_barras_intraday(ticker, intervalo, inicio, fim):
+    # Gera as barras em blocos de poucos dias; apenas um bloco fica em memoria por vez
+    import yfinance as yf
+
+    passo = pd.Timedelta(days=DIAS_POR_BLOCO[intervalo])
+    atual = inicio
+    while atual < fim:
+        proximo = min(atual + passo, fim)
+        barras = yf.Ticker(ticker).history(
+            start=atual, end=proximo, interval=intervalo, auto_adjust=False
+        )
+        if not barras.empty:
+            barras = barras[["Open", "Close"]].dropna()
+            barras.index = barras.index.tz_convert("America/Sao_Paulo")
+            yield barras
+        atual = proximo
+
+
+def resumir_sessao(barras):
+    # Features de uma sessao: retorno abertura-fechamento, retorno da ultima hora e vol realizada
+    fechamento = barras["Close"].iloc[-1]
+    abertura = barras["Open"].iloc[0]
+
+    limite_ultima_hora = barras.index[-1] - pd.Timedelta(hours=1)
+    antes = barras.loc[barras.index <= limite_ultima_hora, "Close"]
+    referencia = antes.iloc[-1] if not antes.empty else abertura
+
+    retornos_log = np.log(barras["Close"]).diff().dropna()
+    return {
+        "ret_sessao": fechamento / abertura - 1,
+        "ret_ultima_hora": fechamento / referencia - 1,
+        "vol_realizada": float(np.sqrt((retornos_log ** 2).sum())),
+        "n_barras": len(barras),
+    }
+
+
+def resumir_sessoes(blocos):
+    # Reamostra o fluxo de blocos em sessoes, emitindo cada sessao assim que ela termina.
+    # Apenas as barras da sessao ainda aberta sao carregadas de um bloco para o proximo.
+    pendente = None
+    for bloco in blocos:
+        if pendente is not None:
+            bloco = pd.concat([pendente, bloco])
+            bloco = bloco[~bloco.index.duplicated(keep="last")]
+        datas = bloco.index.normalize()
+        ultima = datas[-1]
+        for data, barras in bloco.groupby(datas):
+            if data == ultima:
+                continue
+            yield data.tz_localize(None), resumir_sessao(barras)
+        pendente = bloco[datas == ultima]
+    if pendente is not None and not pendente.empty:
+        yield pendente.index[-1].normalize().tz_localize(None), resumir_sessao(pendente)
+
+
+def coletar_cotacoes_intraday(dados_da_bolsa, intervalo="1h", hoje=None):
+    if intervalo not in LIMITE_DIAS_INTRADAY:
+        raise ValueError(f"Intervalo intraday invalido: {intervalo}. Use {list(LIMITE_DIAS_INTRADAY)}")
+
+    hoje = pd.Timestamp(hoje or datetime.date.today())
+    fim = hoje + pd.Timedelta(days=1)
+    inicio = max(
+        dados_da_bolsa["Data"].dropna().min() - pd.Timedelta(days=1),
+        hoje - pd.Timedelta(days=LIMITE_DIAS_INTRADAY[intervalo]),
+    )
+
+    series = []
+    for ticker, nome in TICKERS_INTRADAY.items():
+        blocos = baixar_barras_intraday(ticker, intervalo, inicio, fim)
+        sessoes = {data: features for data, features in resumir_sessoes(blocos)}
+        if not sessoes:
+            continue
+        features = pd.DataFrame.from_dict(sessoes, orient="index")
+        features.columns = [f"{nome}_{c}" for c in features.columns]
+        series.append(features)
+
+    if not series:
+        return pd.DataFrame(columns=["Data"])
+
+    intraday = pd.concat(series, axis=1).rename_axis("Data").reset_index()
+    print(f"Sessoes intraday coletadas ({intervalo}): {intraday.shape}")
+    return intraday
+
+
+def executar_coleta(pasta="Dados", intervalo_intraday=None):
+    # Coleta fluxo e cotacoes (e, opcionalmente, as features intraday) e grava a base
+    pasta = criar_pasta_dados(pasta)
+
+    dados_da_bolsa = coletar_dados_fluxo()
+    destino = salvar_tabela(dados_da_bolsa, "dados_da_bolsa", pasta)
+    print(f"Dados do fluxo estrangeiro salvos em {destino}")
+
+    cotacoes = coletar_cotacoes(dados_da_bolsa)
+    destino = salvar_tabela(cotacoes, "dados_da_bolsa_final", pasta)
+    print(f"Cotacoes salvas em {destino}")
+
+    if intervalo_intraday:
+        intraday = coletar_cotacoes_intraday(dados_da_bolsa, intervalo_intraday)
+        destino = salvar_tabela(intraday, "cotacoes_intraday", pasta)
+        print(f"Features intraday salvas em {destino}")
+
+    return dados_da_bolsa, cotacoes
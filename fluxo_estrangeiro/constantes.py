@@ -0,0 +1,10 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Constantes
+Este script define as constantes compartilhadas pelos módulos do pacote.
+
+Não importa nenhuma dependência, para que qualquer módulo (inclusive os
+carregados nos processos dos pools) possa usá-lo sem custo.
+"""
+
+# Categorias de investidor publicadas pela B3, na ordem usada nas tabelas
+CATEGORIAS = ["Estrangeiro", "Inst. Financeira", "Pessoa física", "Institucional", "Outros"]
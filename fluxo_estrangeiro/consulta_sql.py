@@ -0,0 +1,209 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Consultas SQL
+Este script executa consultas SQL ad-hoc sobre os arquivos Parquet da pasta
+Dados usando DuckDB, que lê apenas as colunas e os row groups necessários
+(projection e predicate pushdown) em vez de carregar as tabelas no pandas.
+
+Cada arquivo <nome>.parquet (ou tabela segmentada Dados/<nome>/), além das
+tabelas processadas do snapshot publicado, fica disponível como a tabela
+<nome>. Exemplo:
+
+    python -m fluxo_estrangeiro.consulta_sql "
+        SELECT date_trunc('month', Data) AS mes, sum(Estrangeiro) AS fluxo
+        FROM (SELECT Data, Estrangeiro, \"Dólar\" - lag(\"Dólar\") OVER (ORDER BY Data) AS var_dolar
+              FROM fluxo_completo)
+        WHERE var_dolar > 0
+        GROUP BY 1 ORDER BY 1"
+
+As consultas rodam no mesmo processo da aplicação, então cada conexão tem
+limites de memória e de threads, não grava dados temporários em disco e é
+interrompida após TEMPO_MAXIMO_S segundos.
+"""
+
+import os
+import glob
+import argparse
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .armazenamento import arquivos_segmentos
+from .metadados import versao_snapshot
+from .snapshots import snapshot_atual
+
+LIMITE_PADRAO = 10_000
+TAMANHO_CACHE = 64
+MEMORIA_MAXIMA = os.environ.get("FLUXO_SQL_MEMORIA", "512MB")
+THREADS = 2
+TEMPO_MAXIMO_S = float(os.environ.get("FLUXO_SQL_TEMPO_S", "15"))
+
+_cache = OrderedDict()
+_trava_cache = threading.Lock()
+
+
+class ConsultaInvalida(ValueError):
+    """Consulta rejeitada por não ser uma única instrução de leitura"""
+
+
+class TempoEsgotado(RuntimeError):
+    """Consulta interrompida por exceder o tempo máximo de execução"""
+
+
+def listar_tabelas(pasta="Dados", pasta_snapshot=None):
+    """Mapeia o nome de cada tabela disponível para a lista dos seus arquivos Parquet
+
+    As tabelas processadas vêm de `pasta_snapshot` (por padrão, o snapshot
+    publicado). Tabelas segmentadas têm precedência sobre arquivos únicos de
+    mesmo nome.
+    """
+    if pasta_snapshot is None:
+        pasta_snapshot = snapshot_atual(pasta)
+    arquivos = sorted(glob.glob(os.path.join(pasta, "*.parquet")))
+    if os.path.abspath(pasta_snapshot) != os.path.abspath(pasta):
+        arquivos += sorted(glob.glob(os.path.join(pasta_snapshot, "*.parquet")))
+    tabelas = {os.path.splitext(os.path.basename(a))[0]: [a] for a in arquivos}
+    for manifest in sorted(glob.glob(os.path.join(pasta, "*", "manifest.json"))):
+        nome = os.path.basename(os.path.dirname(manifest))
+        segmentos = arquivos_segmentos(nome, pasta)
+        if segmentos:
+            tabelas[nome] = segmentos
+    return dict(sorted(tabelas.items()))
+
+
+def assinatura_snapshot(pasta="Dados", pasta_snapshot=None):
+    """Identifica o snapshot atual dos dados sem decodificar os arquivos
+
+    Usa o hash gravado no rodapé dos arquivos processados e, nos demais,
+    o tamanho e a data de modificação.
+    """
+    return tuple(
+        (caminho, versao_snapshot(caminho))
+        for caminhos in listar_tabelas(pasta, pasta_snapshot).values()
+        for caminho in caminhos
+    )
+
+
+def _validar_consulta(sql):
+    """Aceita apenas uma única instrução SELECT"""
+    import duckdb
+
+    try:
+        instrucoes = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        raise ConsultaInvalida(f"Erro de sintaxe: {e}") from e
+    if len(instrucoes) != 1:
+        raise ConsultaInvalida("Informe exatamente uma consulta")
+    if instrucoes[0].type != duckdb.StatementType.SELECT:
+        raise ConsultaInvalida("Apenas consultas SELECT são permitidas")
+    return instrucoes[0].query.strip().rstrip(";")
+
+
+def _conectar(pasta, pasta_snapshot):
+    """Abre uma conexão em memória com uma view por arquivo Parquet"""
+    import duckdb
+
+    con = duckdb.connect(":memory:")
+    # Limites de recursos: a consulta do usuário não pode esgotar o servidor
+    con.execute("SET memory_limit = ?", [MEMORIA_MAXIMA])
+    con.execute("SET threads = ?", [THREADS])
+    con.execute("SET temp_directory = ''")
+    pasta_abs = os.path.abspath(pasta)
+    for nome, caminhos in listar_tabelas(pasta_abs, os.path.abspath(pasta_snapshot)).items():
+        lista_sql = ", ".join("'" + c.replace("'", "''") + "'" for c in caminhos)
+        con.execute(f'CREATE VIEW "{nome}" AS SELECT * FROM read_parquet([{lista_sql}], union_by_name = true)')
+    # Restringe a leitura de arquivos à pasta de dados
+    con.execute("SET allowed_directories = ?", [[pasta_abs + os.sep]])
+    con.execute("SET enable_external_access = false")
+    return con
+
+
+def _executar_com_tempo_maximo(con, sql, tempo_maximo):
+    """Executa a consulta em outra thread e a interrompe após `tempo_maximo` segundos"""
+    saida = {}
+
+    def executar():
+        try:
+            saida["resultado"] = con.execute(sql).df()
+        except Exception as e:
+            saida["erro"] = e
+
+    execucao = threading.Thread(target=executar, daemon=True)
+    execucao.start()
+    execucao.join(tempo_maximo)
+    if execucao.is_alive():
+        con.interrupt()
+        execucao.join()
+        raise TempoEsgotado(f"Consulta interrompida após {tempo_maximo:g} s")
+    if "erro" in saida:
+        raise saida["erro"]
+    return saida["resultado"]
+
+
+def executar_consulta(sql, pasta="Dados", limite=LIMITE_PADRAO, pasta_snapshot=None):
+    """Executa a consulta e retorna (resultado, truncado)
+
+    O resultado é limitado a `limite` linhas e fica em cache até que os
+    arquivos da pasta mudem. Consultas que excedem TEMPO_MAXIMO_S levantam
+    TempoEsgotado; as que excedem MEMORIA_MAXIMA, um erro do DuckDB.
+    """
+    consulta = _validar_consulta(sql)
+    # O snapshot é resolvido uma única vez: a assinatura e as views usam o mesmo
+    if pasta_snapshot is None:
+        pasta_snapshot = snapshot_atual(pasta)
+    chave = (os.path.abspath(pasta), assinatura_snapshot(pasta, pasta_snapshot), consulta, limite)
+
+    with _trava_cache:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            resultado, truncado = _cache[chave]
+            return resultado.copy(), truncado
+
+    con = _conectar(pasta, pasta_snapshot)
+    try:
+        # Busca uma linha a mais para saber se o resultado foi truncado
+        resultado = _executar_com_tempo_maximo(
+            con, f"SELECT * FROM ({consulta}) LIMIT {int(limite) + 1}", TEMPO_MAXIMO_S
+        )
+    finally:
+        con.close()
+
+    truncado = len(resultado) > limite
+    resultado = resultado.iloc[:limite]
+
+    with _trava_cache:
+        _cache[chave] = (resultado, truncado)
+        while len(_cache) > TAMANHO_CACHE:
+            _cache.popitem(last=False)
+    return resultado.copy(), truncado
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas SQL sobre os arquivos da pasta Dados")
+    parser.add_argument("sql", nargs="?", help="Consulta SELECT (omita para listar as tabelas)")
+    parser.add_argument("--pasta", default="Dados")
+    parser.add_argument("--limite", type=int, default=LIMITE_PADRAO)
+    parser.add_argument("--csv", action="store_true", help="Imprime o resultado em CSV")
+    args = parser.parse_args()
+
+    if not args.sql:
+        for nome, caminhos in listar_tabelas(args.pasta).items():
+            print(f"{nome}: {len(caminhos)} arquivo(s)")
+    else:
+        import duckdb
+
+        try:
+            resultado, truncado = executar_consulta(args.sql, args.pasta, args.limite)
+        except (ConsultaInvalida, TempoEsgotado, duckdb.Error) as e:
+            raise SystemExit(f"Erro na consulta: {e}")
+
+        if args.csv:
+            print(resultado.to_csv(index=False), end="")
+        else:
+            with pd.option_context("display.max_rows", None, "display.width", None):
+                print(resultado)
+        if truncado:
+            print(f"Resultado truncado em {args.limite} linhas.")
@@ -0,0 +1,88 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Consultas por Intervalo de Datas
+Este script responde consultas sobre qualquer intervalo de datas a partir de
+um índice ordenado de datas e das somas acumuladas (prefix sums) de cada
+coluna de fluxo, gravadas no processamento. Localizar o intervalo custa
+O(log n) (busca binária) e o fluxo líquido sai da diferença de duas somas,
+independentemente do tamanho do histórico.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .constantes import CATEGORIAS
+
+COLUNAS_FLUXO = CATEGORIAS[:1] + ["Estrangeiro_em_dolar"] + CATEGORIAS[1:]
+COLUNAS_NIVEL = ["Ibovespa", "Dólar"]
+
+
+def calcular_prefixos(fluxo_completo):
+    """Calcula as somas acumuladas de cada coluna de fluxo, ordenadas por data"""
+    dados = fluxo_completo.sort_values("Data").reset_index(drop=True)
+    colunas_fluxo = [c for c in COLUNAS_FLUXO if c in dados.columns]
+    colunas_nivel = [c for c in COLUNAS_NIVEL if c in dados.columns]
+
+    prefixos = dados[["Data"] + colunas_nivel].copy()
+    # Dias sem valor contam como zero para que a diferença entre prefixos seja sempre válida
+    prefixos[colunas_fluxo] = dados[colunas_fluxo].fillna(0).cumsum()
+    return prefixos
+
+
+class IndiceIntervalos:
+    """Índice de datas com somas acumuladas para consultas por intervalo"""
+
+    def __init__(self, prefixos):
+        self.datas = prefixos["Data"].to_numpy(dtype="datetime64[ns]")
+        self.colunas_fluxo = [c for c in COLUNAS_FLUXO if c in prefixos.columns]
+        self.colunas_nivel = [c for c in COLUNAS_NIVEL if c in prefixos.columns]
+
+        # Linha de zeros no início: soma de [i, j] = somas[j + 1] - somas[i]
+        somas = prefixos[self.colunas_fluxo].to_numpy(dtype=float)
+        self.somas = np.vstack([np.zeros((1, somas.shape[1])), somas])
+        self.niveis = prefixos[self.colunas_nivel].to_numpy(dtype=float)
+
+    def __len__(self):
+        return len(self.datas)
+
+    @property
+    def data_minima(self):
+        return pd.Timestamp(self.datas[0]) if len(self) else None
+
+    @property
+    def data_maxima(self):
+        return pd.Timestamp(self.datas[-1]) if len(self) else None
+
+    def posicoes(self, inicio=None, fim=None):
+        """Retorna o intervalo [i, j) de posições entre inicio e fim (inclusive)"""
+        i = 0 if inicio is None else int(np.searchsorted(self.datas, np.datetime64(pd.Timestamp(inicio)), "left"))
+        j = len(self) if fim is None else int(np.searchsorted(self.datas, np.datetime64(pd.Timestamp(fim)), "right"))
+        return i, max(i, j)
+
+    def fluxo_liquido(self, inicio=None, fim=None):
+        """Fluxo líquido de cada coluna no intervalo, a partir de duas consultas"""
+        i, j = self.posicoes(inicio, fim)
+        return pd.Series(self.somas[j] - self.somas[i], index=self.colunas_fluxo)
+
+    def metricas(self, inicio=None, fim=None):
+        """Resumo do intervalo: pregões, fluxos líquidos e variação das cotações"""
+        i, j = self.posicoes(inicio, fim)
+        metricas = {"Pregoes": j - i}
+        metricas.update(zip(self.colunas_fluxo, (self.somas[j] - self.somas[i]).tolist()))
+        for k, coluna in enumerate(self.colunas_nivel):
+            if j - i >= 1:
+                # Base no fechamento anterior ao intervalo, como o fluxo do primeiro pregão
+                # já é contado; no início do histórico usa o primeiro fechamento
+                inicial, final = self.niveis[max(i - 1, 0), k], self.niveis[j - 1, k]
+                metricas[f"{coluna}_variacao"] = float(final / inicial - 1) if inicial else np.nan
+            else:
+                metricas[f"{coluna}_variacao"] = np.nan
+        return metricas
+
+    def curva_acumulada(self, inicio=None, fim=None):
+        """Curvas acumuladas a partir do início do intervalo, no formato de fluxo_total"""
+        i, j = self.posicoes(inicio, fim)
+        curva = pd.DataFrame(self.somas[i + 1:j + 1] - self.somas[i], columns=self.colunas_fluxo)
+        curva.insert(0, "Data", self.datas[i:j])
+        for k, coluna in enumerate(self.colunas_nivel):
+            curva[coluna] = self.niveis[i:j, k]
+        return curva
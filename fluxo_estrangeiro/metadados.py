@@ -0,0 +1,99 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Metadados do Snapshot
+Este script grava e lê os metadados do snapshot de dados (data máxima,
+número de linhas, hash do conteúdo e versões das fontes) no rodapé
+(key-value metadata) dos arquivos Parquet processados.
+
+Ler esses metadados exige apenas o rodapé do arquivo, sem decodificar as
+colunas, e é o que a aplicação, a API e a linha de comando usam para saber
+se os dados estão atualizados e se os seus caches ainda são válidos.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .snapshots import snapshot_atual
+
+CHAVE_METADADOS = b"fluxo_snapshot"
+
+
+def hash_conteudo(dados):
+    """Hash do conteúdo de um DataFrame (valores e nomes de colunas)"""
+    valores = pd.util.hash_pandas_object(dados, index=False).to_numpy()
+    colunas = "|".join(map(str, dados.columns)).encode()
+    return hashlib.sha256(colunas + valores.tobytes()).hexdigest()
+
+
+def criar_metadados_snapshot(fluxo_completo, ano_referencia, fontes=None):
+    """Monta os metadados de um snapshot a partir do fluxo completo processado"""
+    data_maxima = fluxo_completo["Data"].max()
+    # O ano de referência entra no hash porque define o conteúdo de fluxo_ano_atual
+    hash_snapshot = hashlib.sha256(f"{hash_conteudo(fluxo_completo)}:{ano_referencia}".encode()).hexdigest()
+    return {
+        "hash": hash_snapshot,
+        "data_maxima": data_maxima.strftime("%Y-%m-%d") if pd.notna(data_maxima) else None,
+        "linhas": int(len(fluxo_completo)),
+        "ano_referencia": int(ano_referencia),
+        "gerado_em": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "versoes": {
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+        },
+        "fontes": fontes or {},
+    }
+
+
+def gravar_parquet(dados, caminho, metadados):
+    """Grava o DataFrame em Parquet com os metadados do snapshot no rodapé"""
+    tabela = pa.Table.from_pandas(dados)
+    if metadados is not None:
+        metadados_schema = dict(tabela.schema.metadata or {})
+        metadados_schema[CHAVE_METADADOS] = json.dumps(metadados, ensure_ascii=False).encode("utf-8")
+        tabela = tabela.replace_schema_metadata(metadados_schema)
+    pq.write_table(tabela, caminho)
+
+
+def ler_metadados(caminho):
+    """Lê apenas o rodapé do arquivo e retorna os metadados do snapshot (ou None)"""
+    if not os.path.exists(caminho):
+        return None
+    metadados = pq.read_metadata(caminho).metadata or {}
+    if CHAVE_METADADOS not in metadados:
+        return None
+    return json.loads(metadados[CHAVE_METADADOS].decode("utf-8"))
+
+
+def versao_snapshot(caminho):
+    """Identificador barato do snapshot: hash do conteúdo ou, sem metadados, tamanho e data do arquivo"""
+    metadados = ler_metadados(caminho)
+    if metadados is not None:
+        return metadados["hash"]
+    if not os.path.exists(caminho):
+        return None
+    info = os.stat(caminho)
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    pasta = snapshot_atual(sys.argv[1] if len(sys.argv) > 1 else "Dados")
+    print(f"Snapshot: {pasta}")
+    metadados = ler_metadados(f"{pasta}/fluxo_completo.parquet")
+    if metadados is None:
+        print("Snapshot sem metadados. Execute o processamento de dados.")
+        sys.exit(1)
+
+    print(json.dumps(metadados, ensure_ascii=False, indent=2))
+    data_maxima = pd.Timestamp(metadados["data_maxima"])
+    atraso = (pd.Timestamp(datetime.date.today()) - data_maxima).days
+    print(f"Dados atualizados até {data_maxima:%d/%m/%Y} ({atraso} dia(s) atrás)")
@@ -0,0 +1,198 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Processamento de Dados
+Este módulo processa os dados coletados e gera as análises necessárias.
+"""
+
+# Bibliotecas
+import datetime
+
+import pandas as pd
+
+from .armazenamento import ler_tabela, tabela_existe
+from .intervalos import calcular_prefixos
+from .metadados import criar_metadados_snapshot, hash_conteudo
+from .cache_arrow import salvar_processado
+from .snapshots import snapshot_atual, criar_snapshot, publicar_snapshot
+
+def carregar_dados(pasta="Dados"):
+    """Carrega os dados coletados"""
+    try:
+        dados_da_bolsa = ler_tabela("dados_da_bolsa", pasta)
+        cotacoes = ler_tabela("dados_da_bolsa_final", pasta)
+        return dados_da_bolsa, cotacoes
+    except FileNotFoundError:
+        print("Arquivos de dados não encontrados. Execute primeiro o script de coleta de dados.")
+        return None, None
+
+def _remover_timezone(serie):
+    """Remove timezone de uma Series de datas, se presente."""
+    try:
+        if serie.dt.tz is not None:
+            return serie.dt.tz_localize(None)
+    except Exception:
+        pass
+    return serie
+
+def mesclar_dados(dados_da_bolsa, cotacoes):
+    """Mescla os dados de fluxo com as cotações"""
+    # Verifica se a coluna 'Data' existe no dataframe de cotações
+    if "Data" not in cotacoes.columns:
+        raise KeyError(
+            f"Coluna 'Data' não encontrada em cotacoes. Colunas disponíveis: {list(cotacoes.columns)}"
+        )
+
+    # Garantir que os formatos de data são compatíveis
+    dados_da_bolsa["Data"] = _remover_timezone(pd.to_datetime(dados_da_bolsa["Data"], errors='coerce'))
+    cotacoes["Data"] = _remover_timezone(pd.to_datetime(cotacoes["Data"], errors='coerce'))
+    
+    # Mesclar dados
+    fluxo_mais_ibov = pd.merge(cotacoes, dados_da_bolsa, on="Data", how="left")
+
+    # Preencher Dólar com forward/backward fill caso haja falhas de download (ex: rate limit)
+    if "Dólar" in fluxo_mais_ibov.columns:
+        fluxo_mais_ibov["Dólar"] = (
+            fluxo_mais_ibov["Dólar"].ffill().bfill()
+        )
+
+    # Remover apenas linhas sem Ibovespa ou Estrangeiro (colunas essenciais)
+    fluxo_mais_ibov.dropna(subset=["Ibovespa", "Estrangeiro"], inplace=True)
+
+    # Calcular fluxo em dólar
+    fluxo_mais_ibov["Estrangeiro_em_dolar"] = fluxo_mais_ibov["Estrangeiro"] / fluxo_mais_ibov["Dólar"]
+    
+    return fluxo_mais_ibov
+
+def mesclar_intraday(fluxo_completo, pasta="Dados"):
+    """Acrescenta as features intraday por sessão, se a coleta intraday foi executada"""
+    if not tabela_existe("cotacoes_intraday", pasta):
+        return fluxo_completo
+    try:
+        intraday = ler_tabela("cotacoes_intraday", pasta)
+    except FileNotFoundError:
+        return fluxo_completo
+    
+    intraday["Data"] = _remover_timezone(pd.to_datetime(intraday["Data"], errors='coerce'))
+    return pd.merge(fluxo_completo, intraday, on="Data", how="left")
+
+def calcular_fluxo_acumulado(dados_fluxo, ano_filtro=None):
+    """Calcula o fluxo acumulado para o período desejado"""
+    # Filtrar por ano se especificado
+    if ano_filtro:
+        dados_filtrados = dados_fluxo[dados_fluxo["Data"].dt.year == ano_filtro]
+    else:
+        dados_filtrados = dados_fluxo
+    
+    # Extrair os componentes necessários
+    indice = dados_filtrados["Data"]
+    ibov = dados_filtrados["Ibovespa"]
+    estrangeiro_acumulado = dados_filtrados["Estrangeiro"].cumsum()
+    estrangeiro_dolar_acumulado = dados_filtrados["Estrangeiro_em_dolar"].cumsum()
+    
+    # Criar dataframe com dados acumulados
+    fluxo_acumulado = pd.concat([
+        indice, 
+        ibov,
+        estrangeiro_acumulado,
+        estrangeiro_dolar_acumulado
+    ], axis=1)
+    
+    fluxo_acumulado.columns = ["Data", "Ibovespa", "Estrangeiro", "Estrangeiro_em_dolar"]
+    fluxo_acumulado = fluxo_acumulado.dropna()
+    
+    return fluxo_acumulado
+
+def calcular_matriz_anual(dados_fluxo, coluna="Estrangeiro"):
+    """Calcula a matriz de fluxo acumulado por ano (linhas) e número do pregão no ano (colunas)"""
+    dados = dados_fluxo[["Data", coluna]].dropna().sort_values("Data")
+    ano = dados["Data"].dt.year
+    
+    # Numeração do pregão e acumulado dentro de cada ano, sem laços por ano
+    dados = dados.assign(
+        Ano=ano,
+        Pregao=dados.groupby(ano).cumcount() + 1,
+        Acumulado=dados[coluna].groupby(ano).cumsum()
+    )
+    
+    matriz = dados.pivot(index="Ano", columns="Pregao", values="Acumulado")
+    matriz.columns = [str(c) for c in matriz.columns]
+    
+    # Data do primeiro pregão de cada ano, para identificar anos com histórico parcial
+    matriz.insert(0, "Primeiro_Pregao", dados.groupby("Ano")["Data"].min())
+    return matriz
+
+def processar_dados_para_analise(pasta="Dados"):
+    """Processa todos os dados para análise"""
+    # As análises só são importadas aqui: mesclar_dados e as demais funções de
+    # processamento ficam disponíveis sem carregar esses módulos
+    from .analise_lead_lag import calcular_perfil_lead_lag
+    from .backtest import executar_backtest_categorias
+    from .regimes import calcular_regimes
+    from .anomalias import atualizar_anomalias
+
+    # Carregar dados
+    dados_da_bolsa, cotacoes = carregar_dados(pasta)
+    if dados_da_bolsa is None:
+        return
+    fontes = {
+        "dados_da_bolsa": hash_conteudo(dados_da_bolsa),
+        "dados_da_bolsa_final": hash_conteudo(cotacoes),
+    }
+    
+    # Mesclar dados
+    fluxo_completo = mesclar_dados(dados_da_bolsa, cotacoes)
+    fluxo_completo = mesclar_intraday(fluxo_completo, pasta)
+    
+    # Obter ano atual
+    ano_atual = datetime.datetime.now().year
+    
+    # Metadados do snapshot gravados no rodapé de todos os arquivos processados
+    # (cada tabela também ganha uma cópia Arrow sem compressão na pasta hot)
+    snapshot = criar_metadados_snapshot(fluxo_completo, ano_atual, fontes)
+    
+    # Todas as tabelas vão para um diretório novo, publicado só ao final;
+    # o estado das anomalias é lido do snapshot publicado anteriormente
+    pasta_anterior = snapshot_atual(pasta)
+    destino = criar_snapshot(pasta)
+    
+    # Salvar dados mesclados
+    salvar_processado(fluxo_completo, "fluxo_completo", destino, snapshot)
+    
+    # Calcular dados acumulados para o ano atual
+    fluxo_ano_atual = calcular_fluxo_acumulado(fluxo_completo, ano_atual)
+    salvar_processado(fluxo_ano_atual, "fluxo_ano_atual", destino, snapshot)
+    
+    # Calcular dados acumulados totais
+    fluxo_total = calcular_fluxo_acumulado(fluxo_completo)
+    salvar_processado(fluxo_total, "fluxo_total", destino, snapshot)
+    
+    # Calcular somas acumuladas para consultas por intervalo de datas
+    fluxo_prefixos = calcular_prefixos(fluxo_completo)
+    salvar_processado(fluxo_prefixos, "fluxo_prefixos", destino, snapshot)
+    
+    # Calcular matriz de fluxo acumulado por ano e pregão
+    fluxo_anual = calcular_matriz_anual(fluxo_completo)
+    salvar_processado(fluxo_anual, "fluxo_anual", destino, snapshot)
+    
+    # Calcular drawdowns em reais e em dólares e regimes de fluxo estrangeiro
+    regimes_diario, regimes_periodos, regimes_resumo = calcular_regimes(fluxo_completo)
+    salvar_processado(regimes_diario, "regimes_diario", destino, snapshot)
+    salvar_processado(regimes_periodos, "regimes_periodos", destino, snapshot)
+    salvar_processado(regimes_resumo, "regimes_resumo", destino, snapshot)
+    
+    # Detectar fluxos extremos de forma incremental (apenas pregões novos)
+    anomalias = atualizar_anomalias(fluxo_completo, destino, pasta_anterior)
+    salvar_processado(anomalias, "anomalias", destino, snapshot)
+    
+    # Calcular perfil lead/lag entre fluxos e cotações
+    lead_lag = calcular_perfil_lead_lag(fluxo_completo)
+    salvar_processado(lead_lag, "lead_lag", destino, snapshot)
+    
+    # Backtest das regras de momentum e reversão do fluxo em toda a grade de parâmetros
+    backtest = executar_backtest_categorias(fluxo_completo)
+    salvar_processado(backtest, "backtest", destino, snapshot)
+    
+    # Troca atômica do ponteiro Dados/ATUAL e remoção dos snapshots antigos
+    if not publicar_snapshot(destino, pasta):
+        print("Um processamento mais recente já foi publicado; este snapshot foi descartado.")
+    
+    return fluxo_ano_atual
@@ -0,0 +1,163 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Drawdowns e Regimes de Fluxo
+Este script calcula, de forma vetorizada e em uma única passada sobre o
+fluxo completo, os picos e drawdowns do Ibovespa em reais e em dólares e
+segmenta o histórico em regimes de fluxo estrangeiro (períodos sustentados
+de entrada ou de saída), cruzando os retornos do mercado com cada regime.
+
+O regime de um pregão é o sinal da soma do fluxo estrangeiro nos últimos
+JANELA_REGIME pregões. Um pregão só é rotulado como regime sustentado quando
+a sequência de mesmo sinal já dura MIN_DURACAO pregões naquela data; antes
+disso fica como "Indefinido". O rótulo de um dia nunca muda com dados futuros.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from .snapshots import snapshot_atual
+
+JANELA_REGIME = 20
+MIN_DURACAO = 10
+PREGOES_ANO = 252
+REGIMES = ["Entrada", "Saída", "Indefinido"]
+
+
+def _drawdown(nivel):
+    """Pico móvel e drawdown (fração abaixo do pico) de uma série de níveis"""
+    pico = np.fmax.accumulate(nivel)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pico, nivel / pico - 1
+
+
+def calcular_regimes(fluxo_completo, coluna="Estrangeiro", janela=JANELA_REGIME, min_duracao=MIN_DURACAO):
+    """Calcula drawdowns, regimes de fluxo e o cruzamento dos retornos por regime
+
+    Retorna três tabelas:
+        diario    uma linha por pregão com picos, drawdowns e regime
+        periodos  uma linha por regime contínuo, com fluxo e retornos no período
+        resumo    retornos do mercado agregados por tipo de regime
+    """
+    dados = fluxo_completo[["Data", "Ibovespa", "Dólar", coluna]].dropna(subset=["Ibovespa", "Dólar"])
+    dados = dados.sort_values("Data").reset_index(drop=True)
+    ibov_brl = dados["Ibovespa"].to_numpy(dtype=float)
+    ibov_usd = ibov_brl / dados["Dólar"].to_numpy(dtype=float)
+    fluxo = dados[coluna].fillna(0).to_numpy(dtype=float)
+    n = len(fluxo)
+    if n == 0:
+        raise ValueError("Sem pregões com Ibovespa e Dólar para calcular os regimes")
+
+    pico_brl, drawdown_brl = _drawdown(ibov_brl)
+    pico_usd, drawdown_usd = _drawdown(ibov_usd)
+
+    # Soma móvel do fluxo pelas somas acumuladas; janelas incompletas não têm regime
+    somas = np.concatenate([[0.0], np.cumsum(fluxo)])
+    fluxo_janela = np.full(n, np.nan)
+    if n >= janela:
+        fluxo_janela[janela - 1:] = somas[janela:] - somas[:-janela]
+    sinal = np.sign(np.nan_to_num(fluxo_janela)).astype(int)
+
+    # Sequências contínuas de mesmo sinal (run-length encoding). A duração é a
+    # contagem até o próprio pregão, não o total da sequência, para que o rótulo
+    # use apenas a informação disponível naquela data
+    inicio_sequencia = np.concatenate([[True], sinal[1:] != sinal[:-1]])
+    posicao = np.arange(n)
+    inicio = np.maximum.accumulate(np.where(inicio_sequencia, posicao, 0))
+    duracao_ate_data = posicao - inicio + 1
+    sustentado = (duracao_ate_data >= min_duracao) & (sinal != 0)
+    regime = np.where(sustentado, np.where(sinal > 0, "Entrada", "Saída"), "Indefinido")
+
+    # Sequências indefinidas vizinhas formam um único período
+    mudanca = np.concatenate([[True], regime[1:] != regime[:-1]])
+    id_regime = np.cumsum(mudanca)
+
+    retorno_brl = np.concatenate([[np.nan], ibov_brl[1:] / ibov_brl[:-1] - 1])
+    retorno_usd = np.concatenate([[np.nan], ibov_usd[1:] / ibov_usd[:-1] - 1])
+
+    diario = pd.DataFrame({
+        "Data": dados["Data"],
+        "Ibovespa": ibov_brl,
+        "Ibovespa_em_dolar": ibov_usd,
+        "Pico_BRL": pico_brl,
+        "Drawdown_BRL": drawdown_brl,
+        "Pico_USD": pico_usd,
+        "Drawdown_USD": drawdown_usd,
+        "Fluxo_Janela": fluxo_janela,
+        "Regime": regime,
+        "Regime_ID": id_regime,
+        "Retorno_BRL": retorno_brl,
+        "Retorno_USD": retorno_usd,
+    })
+
+    # Retorno de cada período: do fechamento anterior ao início até o fechamento final
+    base_brl = np.concatenate([ibov_brl[:1], ibov_brl[:-1]])
+    base_usd = np.concatenate([ibov_usd[:1], ibov_usd[:-1]])
+    grupos = diario.assign(Fluxo=fluxo, Base_BRL=base_brl, Base_USD=base_usd)
+    agregado = grupos.groupby("Regime_ID", sort=True).agg(
+        Regime=("Regime", "first"),
+        Inicio=("Data", "first"),
+        Fim=("Data", "last"),
+        Pregoes=("Data", "size"),
+        Fluxo=("Fluxo", "sum"),
+        Base_BRL=("Base_BRL", "first"),
+        Final_BRL=("Ibovespa", "last"),
+        Base_USD=("Base_USD", "first"),
+        Final_USD=("Ibovespa_em_dolar", "last"),
+        Drawdown_Max_BRL=("Drawdown_BRL", "min"),
+        Drawdown_Max_USD=("Drawdown_USD", "min"),
+    )
+    periodos = agregado.assign(
+        Retorno_BRL=agregado["Final_BRL"] / agregado["Base_BRL"] - 1,
+        Retorno_USD=agregado["Final_USD"] / agregado["Base_USD"] - 1,
+        Em_Andamento=agregado.index == id_regime[-1],
+    )[["Regime", "Inicio", "Fim", "Pregoes", "Fluxo", "Retorno_BRL", "Retorno_USD",
+       "Drawdown_Max_BRL", "Drawdown_Max_USD", "Em_Andamento"]].reset_index(drop=True)
+
+    resumo = _resumir_por_regime(diario, periodos)
+    return diario, periodos, resumo
+
+
+def _resumir_por_regime(diario, periodos):
+    """Cruza os retornos diários (no pregão e no seguinte) com o regime vigente"""
+    # O retorno seguinte usa o regime conhecido no fechamento: sem antecipar informação
+    dados = diario.assign(
+        Seguinte_BRL=diario["Retorno_BRL"].shift(-1),
+        Seguinte_USD=diario["Retorno_USD"].shift(-1),
+        Alta=(diario["Retorno_BRL"] > 0).astype(float).where(diario["Retorno_BRL"].notna()),
+    )
+    resumo = dados.groupby("Regime").agg(
+        Pregoes=("Data", "size"),
+        Retorno_Medio_BRL=("Retorno_BRL", "mean"),
+        Retorno_Medio_USD=("Retorno_USD", "mean"),
+        Volatilidade_BRL=("Retorno_BRL", "std"),
+        Dias_de_Alta=("Alta", "mean"),
+        Retorno_Seguinte_BRL=("Seguinte_BRL", "mean"),
+        Retorno_Seguinte_USD=("Seguinte_USD", "mean"),
+        Drawdown_Medio_BRL=("Drawdown_BRL", "mean"),
+    )
+    resumo["Retorno_Anual_BRL"] = (1 + resumo["Retorno_Medio_BRL"]) ** PREGOES_ANO - 1
+    resumo["Retorno_Anual_USD"] = (1 + resumo["Retorno_Medio_USD"]) ** PREGOES_ANO - 1
+    resumo["Volatilidade_BRL"] *= np.sqrt(PREGOES_ANO)
+
+    por_periodo = periodos.groupby("Regime").agg(
+        Periodos=("Regime", "size"),
+        Duracao_Media=("Pregoes", "mean"),
+        Retorno_Medio_Periodo_BRL=("Retorno_BRL", "mean"),
+    )
+    resumo = resumo.join(por_periodo).reindex([r for r in REGIMES if r in resumo.index])
+    return resumo.reset_index()
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    print(f"Iniciando análise de regimes: {datetime.date.today()}")
+    fluxo_completo = pd.read_parquet(f"{snapshot_atual('Dados')}/fluxo_completo.parquet")
+    diario, periodos, resumo = calcular_regimes(fluxo_completo)
+
+    ultimo = diario.iloc[-1]
+    print(f"Drawdown atual: {ultimo['Drawdown_BRL']:.1%} em reais, {ultimo['Drawdown_USD']:.1%} em dólares")
+    print(f"Regime atual: {ultimo['Regime']} ({periodos.iloc[-1]['Pregoes']} pregões)")
+    print(resumo.to_string(index=False))
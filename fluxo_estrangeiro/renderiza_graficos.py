@@ -0,0 +1,149 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Renderização de Gráficos
+Este script gera em lote as imagens estáticas (PNG) para publicação, no
+estilo do Modelo básico.py: fluxo diário e acumulado de cada categoria de
+investidor contra o Ibovespa, para o período completo e para cada ano.
+
+A renderização é headless (Figure do matplotlib, sem pyplot), distribuída
+entre processos, e cada imagem só é redesenhada quando o hash dos dados que
+ela usa muda. O matplotlib só é importado pelos processos que desenham.
+"""
+
+import os
+import json
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .constantes import CATEGORIAS
+from .metadados import hash_conteudo
+from .snapshots import snapshot_atual
+
+TIPOS = ["diario", "acumulado"]
+ARQUIVO_CACHE = "cache_graficos.json"
+
+# Incrementar quando o layout dos gráficos mudar, para invalidar o cache
+VERSAO_LAYOUT = 1
+
+
+def _nome_arquivo(tipo, categoria, periodo):
+    """Nome do arquivo de imagem de um gráfico"""
+    slug = (categoria.lower().replace(" ", "_").replace(".", "")
+            .replace("í", "i").replace("ç", "c"))
+    return f"{tipo}_{slug}_{periodo}.png"
+
+
+def _hash_dados(dados):
+    """Hash do conteúdo usado por um gráfico"""
+    return f"v{VERSAO_LAYOUT}:{hash_conteudo(dados)}"
+
+
+def _renderizar(tarefa):
+    """Desenha e salva um gráfico (executado nos processos do pool)"""
+    from matplotlib.figure import Figure
+
+    tipo, categoria, periodo, dados, caminho = tarefa
+
+    valores = dados[categoria].cumsum() if tipo == "acumulado" else dados[categoria]
+    descricao = "Acumulado" if tipo == "acumulado" else "Diário"
+    titulo_periodo = "" if periodo == "completo" else f" em {periodo}"
+
+    fig = Figure(figsize=(10, 8))
+    ax1 = fig.add_subplot()
+
+    # Fluxo como barras e Ibovespa em um segundo eixo Y
+    ax1.bar(dados["Data"], valores, color="#58FFE9", label=categoria)
+    ax2 = ax1.twinx()
+    ax2.plot(dados["Data"], dados["Ibovespa"], color="#050A16", label="Ibovespa")
+
+    ax1.set_xlabel("Período")
+    ax1.set_ylabel(f"{categoria} (Milhões R$)", color="black")
+    ax2.set_ylabel("Ibovespa (pontos)", color="black")
+    for rotulo in ax1.get_xticklabels():
+        rotulo.set_rotation(45)
+
+    ax1.legend(loc="upper left")
+    ax2.legend(loc="upper right")
+    ax1.set_title(f"Fluxo {categoria} {descricao} na B3{titulo_periodo}")
+    fig.text(0.01, 0.01, "Fonte: @AfterMarketFL - Base de dados: https://www.dadosdemercado.com.br/")
+    fig.tight_layout(rect=(0, 0.03, 1, 1))
+
+    temporario = caminho + ".tmp.png"
+    fig.savefig(temporario, dpi=100)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def listar_graficos(fluxo_completo):
+    """Lista (tipo, categoria, periodo, dados) de todos os gráficos a gerar"""
+    dados = fluxo_completo.sort_values("Data").reset_index(drop=True)
+    periodos = [("completo", dados)]
+    periodos += [(str(ano), grupo) for ano, grupo in dados.groupby(dados["Data"].dt.year)]
+
+    graficos = []
+    for categoria in [c for c in CATEGORIAS if c in dados.columns]:
+        for periodo, grupo in periodos:
+            grupo = grupo[["Data", categoria, "Ibovespa"]].dropna(subset=[categoria])
+            if grupo.empty:
+                continue
+            for tipo in TIPOS:
+                graficos.append((tipo, categoria, periodo, grupo.reset_index(drop=True)))
+    return graficos
+
+
+def renderizar_graficos(fluxo_completo, pasta_saida="graficos", n_jobs=None, forcar=False):
+    """Renderiza em paralelo os gráficos cujo conteúdo mudou
+
+    Retorna (renderizados, reaproveitados).
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    caminho_cache = os.path.join(pasta_saida, ARQUIVO_CACHE)
+    cache = {}
+    if os.path.exists(caminho_cache) and not forcar:
+        with open(caminho_cache, encoding="utf-8") as f:
+            cache = json.load(f)
+
+    novo_cache, tarefas = {}, []
+    for tipo, categoria, periodo, dados in listar_graficos(fluxo_completo):
+        arquivo = _nome_arquivo(tipo, categoria, periodo)
+        caminho = os.path.join(pasta_saida, arquivo)
+        hash_grafico = _hash_dados(dados)
+        novo_cache[arquivo] = hash_grafico
+        if cache.get(arquivo) != hash_grafico or not os.path.exists(caminho):
+            tarefas.append((tipo, categoria, periodo, dados, caminho))
+
+    if tarefas:
+        n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(tarefas)))
+        if n_jobs == 1:
+            for tarefa in tarefas:
+                _renderizar(tarefa)
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                list(executor.map(_renderizar, tarefas, chunksize=4))
+
+    with open(caminho_cache, "w", encoding="utf-8") as f:
+        json.dump(novo_cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    return len(tarefas), len(novo_cache) - len(tarefas)
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera as imagens estáticas dos gráficos de fluxo")
+    parser.add_argument("--pasta", default="Dados")
+    parser.add_argument("--saida", default="graficos")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--forcar", action="store_true", help="Ignora o cache e redesenha tudo")
+    args = parser.parse_args()
+
+    print(f"Iniciando renderização de gráficos: {datetime.date.today()}")
+    fluxo_completo = pd.read_parquet(f"{snapshot_atual(args.pasta)}/fluxo_completo.parquet")
+    renderizados, reaproveitados = renderizar_graficos(
+        fluxo_completo, args.saida, args.processos, args.forcar
+    )
+    print(f"Gráficos renderizados: {renderizados}, reaproveitados do cache: {reaproveitados}")
+    print(f"Imagens salvas em {args.saida}/")
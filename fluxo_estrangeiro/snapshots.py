@@ -0,0 +1,131 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Snapshots Versionados
+Este script publica os dados processados de forma atômica.
+
+Cada processamento grava todas as tabelas em um diretório novo,
+Dados/snapshots/<versão>/, e só ao final troca o ponteiro Dados/ATUAL para
+ele (os.replace é atômico). Leitores resolvem o ponteiro uma única vez por
+requisição e leem tudo do mesmo diretório, então nunca veem uma mistura de
+arquivos novos e antigos nem arquivos pela metade, e não bloqueiam a escrita.
+Snapshots antigos são removidos, mantendo sempre os mais recentes.
+
+O nome de cada snapshot começa por um número de geração crescente, atribuído
+sob trava na criação (a data e hora em UTC que o seguem são só informativas).
+O ponteiro guarda esse nome e a ordem entre snapshots vem da geração, não do
+relógio: se dois processamentos se sobrepõem, ou se o relógio volta (horário
+de verão, fuso ou NTP), o ponteiro nunca volta para um snapshot mais antigo.
+"""
+
+import os
+import shutil
+import datetime
+import tempfile
+
+from .travas import trava_arquivo
+
+PASTA_SNAPSHOTS = "snapshots"
+PONTEIRO = "ATUAL"
+TRAVA = "ATUAL.trava"
+MANTER_SNAPSHOTS = 3
+DIGITOS_GERACAO = 10
+
+
+def snapshot_atual(pasta="Dados"):
+    """Diretório do snapshot publicado (ou a própria pasta, no formato antigo sem snapshots)"""
+    try:
+        with open(os.path.join(pasta, PONTEIRO), encoding="utf-8") as f:
+            nome = f.read().strip()
+    except FileNotFoundError:
+        return pasta
+    caminho = os.path.join(pasta, PASTA_SNAPSHOTS, nome)
+    return caminho if os.path.isdir(caminho) else pasta
+
+
+def versao_publicada(pasta="Dados"):
+    """Identificador barato do snapshot publicado, para verificação periódica
+
+    Lê apenas o ponteiro (alguns bytes). No formato antigo sem snapshots usa
+    o tamanho e a data de modificação de fluxo_completo.parquet. Retorna None
+    se não houver dados processados.
+    """
+    try:
+        with open(os.path.join(pasta, PONTEIRO), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    try:
+        info = os.stat(os.path.join(pasta, "fluxo_completo.parquet"))
+    except FileNotFoundError:
+        return None
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+def geracao_snapshot(nome):
+    """Número de geração de um snapshot pelo nome (-1 para nomes de outro formato)"""
+    prefixo = nome.split("-", 1)[0]
+    return int(prefixo) if prefixo.isdigit() and len(prefixo) == DIGITOS_GERACAO else -1
+
+
+def criar_snapshot(pasta="Dados"):
+    """Cria um diretório vazio para um novo snapshot, ainda não publicado"""
+    raiz = os.path.join(pasta, PASTA_SNAPSHOTS)
+    os.makedirs(raiz, exist_ok=True)
+    with trava_arquivo(os.path.join(pasta, TRAVA)):
+        # A próxima geração supera a de todos os snapshots existentes, incluindo o publicado
+        geracao = max([0] + [geracao_snapshot(n) for n in os.listdir(raiz)]) + 1
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        prefixo = f"{geracao:0{DIGITOS_GERACAO}d}-{agora:%Y%m%dT%H%M%SZ}-"
+        caminho = tempfile.mkdtemp(prefix=prefixo, dir=raiz)
+    # mkdtemp cria com permissão 0700; o snapshot deve ser legível por outros processos
+    os.chmod(caminho, 0o755)
+    return caminho
+
+
+def publicar_snapshot(caminho_snapshot, pasta="Dados", manter=MANTER_SNAPSHOTS):
+    """Aponta Dados/ATUAL para o snapshot de forma atômica e remove os antigos
+
+    Se outro processamento, iniciado depois, já publicou um snapshot mais
+    novo, o ponteiro não é alterado e este snapshot é descartado. Retorna
+    True se o snapshot foi publicado.
+    """
+    ponteiro = os.path.join(pasta, PONTEIRO)
+    nome = os.path.basename(caminho_snapshot)
+    with trava_arquivo(os.path.join(pasta, TRAVA)):
+        # A geração no nome do publicado decide; o relógio não é consultado
+        atual = snapshot_atual(pasta)
+        if atual != pasta and geracao_snapshot(os.path.basename(atual)) > geracao_snapshot(nome):
+            shutil.rmtree(caminho_snapshot, ignore_errors=True)
+            return False
+
+        temporario = f"{ponteiro}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(nome + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, ponteiro)
+        coletar_snapshots_antigos(pasta, manter)
+    return True
+
+
+def coletar_snapshots_antigos(pasta="Dados", manter=MANTER_SNAPSHOTS):
+    """Remove snapshots anteriores ao publicado, preservando os `manter` mais recentes
+
+    Snapshots mais novos que o publicado podem estar sendo gravados por outro
+    processo e nunca são removidos aqui.
+    """
+    raiz = os.path.join(pasta, PASTA_SNAPSHOTS)
+    atual = os.path.basename(snapshot_atual(pasta))
+    if not os.path.isdir(raiz) or not os.path.isdir(os.path.join(raiz, atual)):
+        return []
+
+    geracao_atual = geracao_snapshot(atual)
+    anteriores = sorted(
+        (n for n in os.listdir(raiz) if n != atual and geracao_snapshot(n) < geracao_atual
+         and os.path.isdir(os.path.join(raiz, n))),
+        key=lambda n: (geracao_snapshot(n), n),
+    )
+    # O publicado conta como um dos snapshots mantidos
+    remover = anteriores[:max(0, len(anteriores) - (manter - 1))]
+    for nome in remover:
+        shutil.rmtree(os.path.join(raiz, nome), ignore_errors=True)
+    return remover
@@ -0,0 +1,50 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Travas de Arquivo
+Este script serializa escritas concorrentes na pasta Dados.
+
+O botão "Atualizar Dados" permite que várias sessões do app coletem e
+processem ao mesmo tempo. Etapas do tipo ler-alterar-gravar (manifests das
+tabelas segmentadas e o ponteiro do snapshot publicado) ficam dentro de uma
+trava exclusiva entre processos, baseada em um arquivo de trava.
+"""
+
+import os
+import time
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def trava_arquivo(caminho):
+    """Mantém uma trava exclusiva sobre `caminho` enquanto o bloco executa
+
+    O arquivo de trava é criado se não existir e nunca é removido (removê-lo
+    permitiria que dois processos travassem arquivos diferentes).
+    """
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(caminho, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
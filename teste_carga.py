@@ -0,0 +1,235 @@
+"""
+Fluxo Estrangeiro de Investimentos na B3 - Teste de Carga
+Este script simula várias sessões simultâneas da aplicação Streamlit usando
+o AppTest do Streamlit sobre uma base sintética, para medir a latência dos
+reruns, o uso de memória por sessão e a vazão.
+
+A aplicação é copiada para uma pasta temporária junto com uma base sintética
+de vários anos. A coleta de dados é substituída por um script local que
+apenas acrescenta um pregão sintético, de modo que o botão "Atualizar Dados"
+exercita o fluxo completo (coleta + processamento) sem acessar a internet.
+
+Exemplo:
+    python teste_carga.py --sessoes 8 --interacoes 10 --anos 10
+"""
+
+import os
+import sys
+import glob
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from fluxo_estrangeiro.constantes import CATEGORIAS
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+APP = "3_app_streamlit.py"
+PACOTE = "fluxo_estrangeiro"
+OPCOES_DADOS = ["Fluxo Diário", "Fluxo Ano Convertido em Dólar", "Fluxo Total Acumulado"]
+
+# Substitui 1_coleta_dados.py na cópia da aplicação: acrescenta um pregão sintético
+COLETA_LOCAL = '''
+import numpy as np
+import pandas as pd
+
+from fluxo_estrangeiro.armazenamento import ler_tabela, salvar_tabela
+
+rng = np.random.default_rng()
+fluxo = ler_tabela("dados_da_bolsa")
+cotacoes = ler_tabela("dados_da_bolsa_final")
+data = pd.Timestamp(fluxo["Data"].max()) + pd.offsets.BDay(1)
+
+novo_fluxo = {"Data": data}
+novo_fluxo.update({c: rng.normal(0, 500) for c in fluxo.columns if c != "Data"})
+ultima = cotacoes.sort_values("Data").iloc[-1]
+nova_cotacao = {
+    "Data": data,
+    "Ibovespa": ultima["Ibovespa"] * np.exp(rng.normal(0, 0.012)),
+    "Dólar": ultima["Dólar"] * np.exp(rng.normal(0, 0.008)),
+}
+
+salvar_tabela(pd.concat([fluxo, pd.DataFrame([novo_fluxo])], ignore_index=True), "dados_da_bolsa")
+salvar_tabela(pd.concat([cotacoes, pd.DataFrame([nova_cotacao])], ignore_index=True), "dados_da_bolsa_final")
+print(f"Pregao sintetico acrescentado: {data:%Y-%m-%d}")
+'''
+
+
+def gerar_base_sintetica(anos, semente=0):
+    """Gera fluxos e cotações sintéticos em dias úteis para o número de anos pedido"""
+    rng = np.random.default_rng(semente)
+    fim = pd.Timestamp.today().normalize() - pd.offsets.BDay(1)
+    datas = pd.bdate_range(fim - pd.DateOffset(years=anos), fim)
+    n = len(datas)
+
+    fluxo = pd.DataFrame({"Data": datas})
+    for categoria in CATEGORIAS:
+        fluxo[categoria] = rng.standard_t(4, n) * 400
+
+    # Ibovespa reage em parte ao fluxo estrangeiro do dia
+    retorno_ibov = 0.0003 + 0.012 * rng.standard_normal(n) + fluxo["Estrangeiro"].to_numpy() * 2e-6
+    cotacoes = pd.DataFrame({
+        "Data": datas,
+        "Dólar": 4.0 * np.exp(np.cumsum(0.007 * rng.standard_normal(n))),
+        "Ibovespa": 100000 * np.exp(np.cumsum(retorno_ibov)),
+    })
+    return fluxo, cotacoes
+
+
+def preparar_sandbox(anos):
+    """Copia a aplicação para uma pasta temporária com a base sintética processada"""
+    pasta = tempfile.mkdtemp(prefix="fluxo_carga_")
+    for arquivo in glob.glob(os.path.join(RAIZ, "*.py")) + glob.glob(os.path.join(RAIZ, "*.png")):
+        shutil.copy(arquivo, pasta)
+    shutil.copytree(os.path.join(RAIZ, PACOTE), os.path.join(pasta, PACOTE),
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    with open(os.path.join(pasta, "1_coleta_dados.py"), "w", encoding="utf-8") as f:
+        f.write(COLETA_LOCAL)
+
+    fluxo, cotacoes = gerar_base_sintetica(anos)
+    ambiente = dict(os.environ, FLUXO_ARMAZENAMENTO="segmentado", PYTHONPATH=pasta)
+    os.makedirs(os.path.join(pasta, "Dados"))
+    fluxo.to_parquet(os.path.join(pasta, "Dados", "dados_da_bolsa.parquet"))
+    cotacoes.to_parquet(os.path.join(pasta, "Dados", "dados_da_bolsa_final.parquet"))
+    subprocess.run([sys.executable, "2_processa_dados.py"], cwd=pasta, env=ambiente,
+                   check=True, capture_output=True)
+    return pasta
+
+
+def _rss_mb():
+    """Memória residente atual do processo em MB (pico, se /proc não existir)
+
+    Retorna None onde a medição não está disponível (Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 2**20 if sys.platform == "darwin" else maximo / 2**10
+
+
+def simular_sessao(caminho_app, interacoes, chance_atualizar, timeout, semente, resultados, trava):
+    """Executa uma sessão: carga inicial seguida de interações aleatórias"""
+    rng = random.Random(semente)
+    latencias, erros = [], 0
+
+    def medir(acao):
+        nonlocal erros
+        inicio = time.perf_counter()
+        try:
+            at = acao()
+            if at.exception:
+                erros += 1
+        except Exception:
+            erros += 1
+            at = None
+        latencias.append(time.perf_counter() - inicio)
+        return at
+
+    at = AppTest.from_file(caminho_app, default_timeout=timeout)
+    at = medir(at.run) or at
+    for _ in range(interacoes):
+        sorteio = rng.random()
+        if sorteio < chance_atualizar:
+            botoes = [b for b in at.button if b.label == "Atualizar Dados"]
+            acao = (lambda: botoes[0].click().run()) if botoes else at.run
+        elif sorteio < 0.6:
+            caixas = [s for s in at.selectbox if s.label == "Selecione o conjunto de dados:"]
+            opcao = rng.choice(OPCOES_DADOS)
+            acao = (lambda: caixas[0].select(opcao).run()) if caixas else at.run
+        else:
+            # Troca de aba: no Streamlit todas as abas são renderizadas a cada rerun
+            acao = at.run
+        at = medir(acao) or at
+
+    with trava:
+        resultados.append({"latencias": latencias, "erros": erros})
+
+
+def executar_teste(sessoes, interacoes, anos, chance_atualizar, timeout, manter):
+    """Prepara a base sintética, executa as sessões em paralelo e retorna o relatório"""
+    pasta = preparar_sandbox(anos)
+    caminho_app = os.path.join(pasta, APP)
+    os.environ["FLUXO_ARMAZENAMENTO"] = "segmentado"
+
+    resultados, trava = [], threading.Lock()
+    memoria_inicial = _rss_mb()
+    inicio = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=simular_sessao,
+            args=(caminho_app, interacoes, chance_atualizar, timeout, i, resultados, trava),
+        )
+        for i in range(sessoes)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    memoria_final = _rss_mb()
+
+    if not manter:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    latencias = np.array([l for r in resultados for l in r["latencias"]]) * 1000
+    return {
+        "sessoes": sessoes,
+        "reruns": len(latencias),
+        "erros": sum(r["erros"] for r in resultados),
+        "duracao_s": duracao,
+        "vazao_reruns_s": len(latencias) / duracao if duracao else float("nan"),
+        "latencia_p50_ms": np.percentile(latencias, 50),
+        "latencia_p90_ms": np.percentile(latencias, 90),
+        "latencia_p99_ms": np.percentile(latencias, 99),
+        "latencia_max_ms": latencias.max(),
+        "memoria_total_mb": memoria_final,
+        "memoria_por_sessao_mb": (None if memoria_final is None
+                                  else (memoria_final - memoria_inicial) / sessoes),
+        "pasta": pasta if manter else None,
+    }
+
+
+# ==============================
+### Output para verificar os resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga da aplicação Streamlit com AppTest")
+    parser.add_argument("--sessoes", type=int, default=8, help="Sessões simultâneas")
+    parser.add_argument("--interacoes", type=int, default=10, help="Interações por sessão")
+    parser.add_argument("--anos", type=int, default=10, help="Anos de histórico sintético")
+    parser.add_argument("--chance-atualizar", type=float, default=0.05,
+                        help="Probabilidade de cada interação ser um clique em 'Atualizar Dados'")
+    parser.add_argument("--timeout", type=float, default=120, help="Tempo máximo por rerun (s)")
+    parser.add_argument("--manter", action="store_true", help="Mantém a pasta temporária")
+    args = parser.parse_args()
+
+    print(f"Simulando {args.sessoes} sessões x {args.interacoes} interações "
+          f"sobre {args.anos} anos de dados sintéticos...")
+    relatorio = executar_teste(args.sessoes, args.interacoes, args.anos,
+                               args.chance_atualizar, args.timeout, args.manter)
+
+    print(f"Reruns: {relatorio['reruns']} ({relatorio['erros']} com erro) em {relatorio['duracao_s']:.1f}s")
+    print(f"Vazão: {relatorio['vazao_reruns_s']:.2f} reruns/s")
+    print(f"Latência (ms): p50={relatorio['latencia_p50_ms']:.0f} p90={relatorio['latencia_p90_ms']:.0f} "
+          f"p99={relatorio['latencia_p99_ms']:.0f} máx={relatorio['latencia_max_ms']:.0f}")
+    if relatorio["memoria_total_mb"] is None:
+        print("Memória: n/d")
+    else:
+        print(f"Memória: {relatorio['memoria_total_mb']:.0f} MB no total, "
+              f"~{relatorio['memoria_por_sessao_mb']:.1f} MB por sessão")
+    if relatorio["pasta"]:
+        print(f"Base sintética mantida em {relatorio['pasta']}")